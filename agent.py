@@ -1,41 +1,134 @@
 import os
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 from smolagents import CodeAgent, PythonInterpreterTool, WikipediaSearchTool, VisitWebpageTool, FinalAnswerTool
+from smolagents.memory import ActionStep
 from tools.utils import reverse_string, process_excel_file, is_text_file, execute_python_file
 from tools.youtube import load_youtube
+from tools import tracing
 from tools.audio import transcribe_audio
-from tools.web import optimized_web_search
+from tools.metrics import instrument_model, instrument_tool
+from tools.web import optimized_web_search, optimized_web_search_batch
+
+# Write one Chrome-trace JSON file per question here; unset disables tracing
+TRACE_DIR = os.getenv("AGENT_TRACE_DIR") or None
+
+
+def _python_interpreter() -> PythonInterpreterTool:
+    """PythonInterpreterTool with its import list sorted, so the prompt is identical in every process."""
+    interpreter = PythonInterpreterTool()
+    listed = str(interpreter.authorized_imports)
+    interpreter.authorized_imports = sorted(interpreter.authorized_imports)
+    code = interpreter.inputs["code"]
+    code["description"] = code["description"].replace(listed, str(interpreter.authorized_imports))
+    return interpreter
+
+
+def build_tools() -> list:
+    """Build the tool instances handed to every CodeAgent, instrumented for metrics."""
+    tools = [
+        _python_interpreter(),
+        WikipediaSearchTool(),
+        VisitWebpageTool(),
+        FinalAnswerTool(),
+        optimized_web_search,
+        optimized_web_search_batch,
+        reverse_string,
+        process_excel_file,
+        is_text_file,
+        load_youtube,
+        execute_python_file,
+        transcribe_audio
+    ]
+    return [instrument_tool(t) for t in tools]
 
 
 class BasicAgent:
-    def __init__(self, model, max_steps: int = 10):
+    """Answers one question at a time with a ``CodeAgent``.
+
+    With ``trace_dir`` set, every question is recorded as a span tree (agent
+    step, LLM call, tool call, sub-operations such as audio decoding, with
+    timings and token counts) and written to
+    ``<trace_dir>/<trace_id>.trace.json`` in Chrome trace format. Work done
+    for the question before the run, such as its attachment download, is
+    passed in as ``spans`` and added to the same trace.
+    """
+
+    def __init__(self, model, max_steps: int = 10, tools: Optional[list] = None,
+                 trace_dir: Optional[str] = TRACE_DIR):
+        model = instrument_model(model)
         self._model = model
         self._agent = CodeAgent(
-            tools=[
-                PythonInterpreterTool(),
-                WikipediaSearchTool(),
-                VisitWebpageTool(),
-                FinalAnswerTool(),
-                optimized_web_search,
-                reverse_string,
-                process_excel_file,
-                is_text_file,
-                load_youtube,
-                execute_python_file,
-                transcribe_audio
-            ],
+            tools=tools if tools is not None else build_tools(),
             additional_authorized_imports=[
                 '*', 'subprocess', 'markdownify', 'chess', 'random',
                 'time', 'itertools', 'pandas', 'webbrowser', 'requests', 'csv', 'openpyxl', 'json', 'yaml'
             ],
             model=model,
             add_base_tools=True,
-            max_steps=max_steps
+            max_steps=max_steps,
+            step_callbacks=[self._trace_step]
         )
+        # Base tools added by CodeAgent itself are instrumented too
+        for registered in self._agent.tools.values():
+            instrument_tool(registered)
+        # Generated code runs on the executor's own thread; carry the trace over to it
+        executor = self._agent.python_executor
+        send_tools = executor.send_tools
+        executor.send_tools = lambda tools: send_tools({name: tracing.carry(t) for name, t in tools.items()})
+        self.trace_dir = trace_dir
+        self.last_trace_path = None
+        self.last_step_count = 0
         print("BasicAgent initialized.")
 
-    def __call__(self, question: str, file_path: Optional[str] = None) -> str:
+    def reset(self) -> None:
+        """Forget the previous run so the agent can be handed out again."""
+        self._agent.memory.reset()
+        self._agent.monitor.reset()
+        self._reset_executor()
+
+    def _reset_executor(self) -> None:
+        """Drop everything generated code left behind, so none of it leaks into the next question."""
+        self._agent.state.clear()
+        executor = self._agent.python_executor
+        # Variables live in ``state``; functions defined with ``def`` live in ``custom_tools``
+        executor.state = {"__name__": "__main__"}
+        executor.custom_tools = {}
+
+    @staticmethod
+    def _trace_step(step: ActionStep, agent=None) -> None:
+        root = tracing.current_span()
+        if root is None or step.timing.end_time is None:
+            return
+        usage = step.token_usage
+        root.trace.add_span(
+            f"step {step.step_number}", "step", step.timing.start_time, step.timing.end_time,
+            input_tokens=usage.input_tokens if usage else None,
+            output_tokens=usage.output_tokens if usage else None,
+            error=str(step.error) if step.error else None,
+            final=step.is_final_answer,
+        )
+
+    def __call__(self, question: str, file_path: Optional[str] = None, timeout: Optional[float] = None,
+                 trace_id: Optional[str] = None, spans: Optional[list] = None) -> str:
+        if not self.trace_dir:
+            return self._run(question, file_path, timeout)
+        trace_id = trace_id or uuid.uuid4().hex
+        with tracing.start_trace("question", trace_id=trace_id, question=question[:200]) as trace:
+            # Finished operations recorded elsewhere, as (name, category, start, end, attrs)
+            for name, category, start, end, attrs in spans or ():
+                trace.add_span(name, category, start, end, **attrs)
+            try:
+                return self._run(question, file_path, timeout)
+            finally:
+                trace.root.set(steps=self.last_step_count)
+                self.last_trace_path = trace.dump(os.path.join(self.trace_dir, f"{trace_id}.trace.json"))
+
+    def _run(self, question: str, file_path: Optional[str], timeout: Optional[float]) -> str:
         prompt = question
         if file_path and os.path.exists(file_path):
             try:
@@ -58,5 +151,78 @@ class BasicAgent:
             except Exception as e:
                 print(f"Failed to read file: {e}")
         print(prompt)
-        answer = self._agent.run(prompt)
+        # The interrupt is honoured before the next step starts
+        timer = threading.Timer(timeout, self._agent.interrupt) if timeout else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        try:
+            answer = self._agent.run(prompt)
+        except Exception as e:
+            if timer is not None and timer.finished.is_set():
+                raise TimeoutError(f"Agent run exceeded {timeout:.0f}s") from e
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.last_step_count = sum(isinstance(step, ActionStep) for step in self._agent.memory.steps)
         return answer
+
+
+class AgentPool:
+    """Hands out warmed, memory-reset ``BasicAgent`` instances.
+
+    The model client and the tool instances are built once and shared by every
+    agent in the pool, so borrowing an agent costs nothing after warm-up and the
+    model's HTTP connections stay open between runs. An agent is only ever
+    used by one caller at a time.
+    """
+
+    def __init__(self, model, max_steps: int = 10, trace_dir: Optional[str] = TRACE_DIR):
+        self.model = instrument_model(model)
+        self.max_steps = max_steps
+        self.trace_dir = trace_dir
+        self._tools = build_tools()
+        self._idle = queue.LifoQueue()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _new_agent(self) -> BasicAgent:
+        agent = BasicAgent(self.model, max_steps=self.max_steps, tools=self._tools, trace_dir=self.trace_dir)
+        with self._lock:
+            self._size += 1
+        return agent
+
+    def warm(self, count: int) -> None:
+        """Make sure at least ``count`` agents exist."""
+        while self._size < count:
+            self._idle.put(self._new_agent())
+
+    @contextmanager
+    def agent(self):
+        try:
+            agent = self._idle.get_nowait()
+        except queue.Empty:
+            agent = self._new_agent()
+        try:
+            yield agent
+        finally:
+            agent.reset()
+            self._idle.put(agent)
+
+
+_pool: Optional[AgentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_agent_pool(model_factory: Callable, max_steps: int = 10) -> AgentPool:
+    """Return the process-wide agent pool, building it with ``model_factory`` on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentPool(model_factory(), max_steps=max_steps)
+        return _pool
@@ -1,12 +1,10 @@
 import os
 import logging
 import gradio as gr
-import requests
-import pandas as pd
 
-from agent import BasicAgent
-from smolagents import OpenAIServerModel
-from tools.utils import download_file
+from agent import get_agent_pool
+from pipeline import MAX_WORKERS, RUN_BUDGET, TASK_TIMEOUT, build_model, run_evaluation
+from tools.metrics import metrics
 
 # --- Configure Logging ---
 logging.basicConfig(
@@ -16,97 +14,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# --- Constants ---
-DEFAULT_API_URL = "https://agents-course-unit4-scoring.hf.space"
 
-
-def run_and_submit_all(profile: gr.OAuthProfile | None):
+async def run_and_submit_all(
+    profile: gr.OAuthProfile | None,
+    max_workers: int = MAX_WORKERS,
+    force_recompute: bool = False,
+    task_timeout: float = TASK_TIMEOUT,
+    run_budget: float = RUN_BUDGET,
+):
     if not profile:
-        return "Please login to Hugging Face.", None
+        yield "Please login to Hugging Face.", None
+        return
 
     username = profile.username.strip()
     logger.info(f"User logged in: {username}")
+    max_workers = max(1, int(max_workers))
 
-    # Instantiate model and agent
+    # Reuse the process-wide model client and agents across runs
     try:
-        api_key = os.getenv("clave_open_ai", "").strip()
-        model = OpenAIServerModel(
-            model_id="gpt-4.1-2025-04-14",
-            api_key=api_key
-        )
-        agent = BasicAgent(model, max_steps=10)
-        logger.info(f"Agent initialized with model {model.model_id}")
+        agents = get_agent_pool(build_model, max_steps=10)
+        agents.warm(max_workers)
+        logger.info(f"{agents.size} agents ready with model {agents.model.model_id}")
     except Exception as e:
         logger.error(f"Error initializing agent: {e}")
-        return f"Initialization failed: {e}", None
-
-    # Fetch questions
-    questions_url = f"{DEFAULT_API_URL}/questions"
-    logger.info(f"Fetching questions from: {questions_url}")
-    try:
-        resp = requests.get(questions_url, timeout=15)
-        resp.raise_for_status()
-        questions = resp.json()
-        logger.info(f"Fetched {len(questions)} questions.")
-    except Exception as e:
-        logger.error(f"Failed to fetch questions: {e}")
-        return f"Fetch error: {e}", None
-
-    # Run agent on each question
-    results = []
-    answers_payload = []
-    for item in questions:
-        tid = item.get("task_id")
-        text = item.get("question", "")
-        file_name = item.get("file_name")
-        path = None
-        try:
-            if file_name:
-                path = download_file(f"{DEFAULT_API_URL}/files/{tid}", file_name)
-            ans = agent(text, path)
-            answers_payload.append({"task_id": tid, "submitted_answer": str(ans)})
-            results.append({"Task ID": tid, "Answer": ans})
-            logger.info(f"Answered task {tid}")
-        except Exception as e:
-            logger.warning(f"Agent error on {tid}: {e}")
-            results.append({"Task ID": tid, "Answer": f"ERROR: {e}"})
-
-    # Submit everything once
-    submission = {
-        "username": username,
-        "agent_code": f"https://huggingface.co/spaces/{os.getenv('SPACE_ID')}/tree/main",
-        "answers": answers_payload
-    }
-    submit_url = f"{DEFAULT_API_URL}/submit"
-    logger.info(f"Submitting {len(answers_payload)} answers...")
-    try:
-        r = requests.post(submit_url, json=submission, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-        status = (
-            f"Submission Successful: {data.get('score')}% "
-            f"({data.get('correct_count')}/{data.get('total_attempted')})"
-        )
-        logger.info(status)
-    except Exception as e:
-        logger.error(f"Submission failed: {e}")
-        status = f"Submit error: {e}"
-
-    df = pd.DataFrame(results)
-    return status, df
+        yield f"Initialization failed: {e}", None
+        return
+
+    # Stream progress to the UI as each task finishes
+    async for status, df in run_evaluation(
+        agents,
+        username=username,
+        agent_code=f"https://huggingface.co/spaces/{os.getenv('SPACE_ID')}/tree/main",
+        max_workers=max_workers,
+        force_recompute=force_recompute,
+        task_timeout=float(task_timeout or 0),
+        run_budget=float(run_budget or 0),
+    ):
+        yield status, df
 
 
 # --- Gradio Interface ---
 with gr.Blocks() as demo:
     gr.Markdown("# Agent Runner")
     gr.LoginButton()
+    workers_in = gr.Slider(1, 16, value=MAX_WORKERS, step=1, label="Concurrent questions")
+    force_in = gr.Checkbox(value=False, label="Force recompute (ignore cached answers)")
+    timeout_in = gr.Number(value=TASK_TIMEOUT, label="Per-task timeout (s, 0 = none)")
+    budget_in = gr.Number(value=RUN_BUDGET, label="Run budget (s, 0 = unlimited)")
     run_btn = gr.Button("Run & Submit")
     status_out = gr.Textbox(interactive=False)
     df_out = gr.DataFrame()
 
-    run_btn.click(fn=run_and_submit_all, outputs=[status_out, df_out])
+    run_btn.click(fn=run_and_submit_all, inputs=[workers_in, force_in, timeout_in, budget_in], outputs=[status_out, df_out])
+
+    with gr.Accordion("Metrics", open=False):
+        metrics_btn = gr.Button("Refresh")
+        metrics_out = gr.Code(label="Prometheus text format")
+        metrics_btn.click(fn=metrics.to_prometheus, outputs=[metrics_out])
 
 if __name__ == "__main__":
     logger.info("Starting app...")
     demo.launch(debug=False, share=False)
-
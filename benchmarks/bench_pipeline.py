@@ -0,0 +1,282 @@
+"""
+End-to-end pipeline throughput against local stand-ins for every external service.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline                       # 24 tasks, 4 workers
+    python -m benchmarks.bench_pipeline --tasks 60 --workers 8 --llm-latency 0.2
+
+``pipeline.run_evaluation`` runs unchanged against:
+
+* a fake scoring API on 127.0.0.1 serving ``/questions``, ``/files/<task_id>``
+  and ``/submit`` (it scores the submitted answers);
+* a deterministic fake LLM that replays a scripted tool call per question
+  kind, then calls ``final_answer``;
+* stubbed web search and transcription backends with fixed latencies.
+
+Answers, transcripts, attachments and the run's metrics go to temporary
+directories, so the real caches and ``metrics/`` are neither read nor
+written. Attachments use a fixed path that is cleared on every run, which
+keeps prompts identical between runs for ``--llm-cache``. The report gives
+end-to-end tasks/sec, p50/p95 task latency and per-tool time from
+``tools.metrics``.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from smolagents.models import ChatMessage, Model
+from smolagents.monitoring import TokenUsage
+
+import pipeline
+from agent import AgentPool
+from tools import audio, web
+from tools.attachments import AttachmentStore
+from tools.audio import transcribe_audio
+from tools.cache import DiskCache
+from tools.llm_cache import CachingModel
+from tools.metrics import metrics
+from tools.ratelimit import TokenBucket
+
+KINDS = ("search", "audio", "reverse", "text")
+TRANSCRIPT = "the quick brown fox jumps over the lazy dog"
+
+
+def make_questions(count: int, attachment_bytes: int) -> tuple:
+    """Build ``count`` questions cycling through ``KINDS``; returns (questions, files, expected answers)."""
+    questions, files, expected = [], {}, {}
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        tid = f"bench-{i:04d}"
+        item = {"task_id": tid, "question": f"[bench:{kind}] Question {i} about topic {i % 7}?", "file_name": ""}
+        if kind == "audio":
+            item["file_name"] = f"{tid}.mp3"
+            files[tid] = bytes(i % 256 for i in range(attachment_bytes))
+        elif kind == "text":
+            item["file_name"] = f"{tid}.txt"
+            files[tid] = f"Reference notes for question {i}.\n".encode() * 8
+        questions.append(item)
+        expected[tid] = f"{kind}-{i}"
+    return questions, files, expected
+
+
+class FakeScoringAPI:
+    """Threaded HTTP server with the scoring API's three endpoints."""
+
+    def __init__(self, questions: list, files: dict, expected: dict):
+        api = self
+        self.questions = questions
+        self.files = files
+        self.expected = expected
+        self.submission = None
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/questions":
+                    self._send(200, json.dumps(api.questions).encode())
+                elif self.path.startswith("/files/") and self.path[len("/files/"):] in api.files:
+                    self._send(200, api.files[self.path[len("/files/"):]], "application/octet-stream")
+                else:
+                    self._send(404, b'{"detail": "not found"}')
+
+            def do_POST(self):
+                if self.path != "/submit":
+                    self._send(404, b'{"detail": "not found"}')
+                    return
+                api.submission = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                answers = api.submission["answers"]
+                correct = sum(api.expected.get(a["task_id"]) == a["submitted_answer"] for a in answers)
+                score = round(100 * correct / len(api.questions), 1) if api.questions else 0
+                self._send(200, json.dumps({
+                    "username": api.submission["username"], "score": score,
+                    "correct_count": correct, "total_attempted": len(answers), "message": "ok",
+                }).encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeScoringAPI":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def _text(message) -> str:
+    content = message.get("content") if isinstance(message, dict) else message.content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _role(message) -> str:
+    role = message.get("role") if isinstance(message, dict) else message.role
+    return getattr(role, "value", role)
+
+
+class ScriptedModel(Model):
+    """
+    Deterministic stand-in for the LLM. The first step calls the tool that
+    matches the question's ``[bench:<kind>]`` tag; the next one answers.
+    Every call sleeps ``latency`` seconds to mimic a model round trip.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        super().__init__(model_id="scripted-bench-model")
+        self.latency = latency
+
+    def _script(self, task: str, step: int) -> str:
+        kind = re.search(r"\[bench:(\w+)\]", task).group(1)
+        number = int(re.search(r"Question (\d+)", task).group(1))
+        if step > 0:
+            return f'final_answer("{kind}-{number}")'
+        if kind == "search":
+            return (
+                f'r = optimized_web_search(search_query="topic {number % 7} facts", important_words=["topic", "facts"])\n'
+                "print(r[:200])"
+            )
+        if kind == "audio":
+            mp3_path = re.search(r"Attached mp3 file: (\S+)", task).group(1)
+            return f'print(transcribe_audio(mp3_path="{mp3_path}"))'
+        if kind == "reverse":
+            return f'print(reverse_string("question {number}"))'
+        return f'final_answer("{kind}-{number}")'
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+        time.sleep(self.latency)
+        task = next(_text(m) for m in messages if _role(m) == "user")
+        step = sum(1 for m in messages if _role(m) == "assistant")
+        code = self._script(task, step)
+        prompt_chars = sum(len(_text(m)) for m in messages)
+        return ChatMessage(
+            role="assistant",
+            content=f"Thought: scripted step {step}.\n<code>\n{code}\n</code>",
+            token_usage=TokenUsage(input_tokens=prompt_chars // 4, output_tokens=len(code) // 4),
+        )
+
+
+class FakeSearchClient:
+    """Returns canned markdown results after ``latency`` seconds."""
+
+    latency = 0.2
+
+    def forward(self, query: str) -> str:
+        time.sleep(self.latency)
+        return "## Search Results\n\n" + "\n\n".join(
+            f"[Result {i} for {query}](https://example.com/{i})\nSome facts about {query}. "
+            "Unrelated filler text that the keyword filter should drop. " * 3
+            for i in range(5)
+        )
+
+
+def install_stubs(search_latency: float, transcribe_latency: float, search_rate: float | None) -> None:
+    """Swap the search client factory and the transcription backend for local stand-ins."""
+    FakeSearchClient.latency = search_latency
+    web.search_clients = web.SearchClientPool(factory=FakeSearchClient, max_size=web.SEARCH_POOL_SIZE)
+    if search_rate:
+        web.search_limiter = TokenBucket(rate=search_rate, burst=max(1, int(search_rate)))
+
+    def fake_transcribe(mp3_path: str) -> str:
+        time.sleep(transcribe_latency)
+        return TRANSCRIPT
+
+    transcribe_audio.forward = fake_transcribe
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+async def run(args, api: FakeScoringAPI, metrics_dir: str) -> tuple:
+    model = ScriptedModel(latency=args.llm_latency)
+    if args.llm_cache != "passthrough":
+        model = CachingModel(model, mode=args.llm_cache)
+    agents = AgentPool(model, max_steps=4)
+    agents.warm(args.workers)
+    start = time.perf_counter()
+    status, df = None, None
+    async for status, frame in pipeline.run_evaluation(
+        agents, username="bench", agent_code="local", api_url=api.url,
+        max_workers=args.workers, force_recompute=True, task_timeout=args.task_timeout, metrics_dir=metrics_dir,
+    ):
+        if frame is not None:
+            df = frame
+    return time.perf_counter() - start, status, df
+
+
+def report(elapsed: float, status: str, df, tasks: int) -> None:
+    latencies = [float(x) for x in df["Latency (s)"]] if df is not None else []
+    print(f"\n{tasks} tasks in {elapsed:.2f}s -> {tasks / elapsed:.2f} tasks/sec")
+    print(f"task latency p50 {percentile(latencies, 50):.3f}s   p95 {percentile(latencies, 95):.3f}s"
+          f"   max {max(latencies, default=0):.3f}s")
+    print(f"statuses: {df['Status'].value_counts().to_dict() if df is not None else {}}")
+    print(status.splitlines()[0])
+
+    snapshot = metrics.snapshot()
+    print(f"\n{'kind':<6} {'name':<28} {'calls':>6} {'errors':>6} {'total s':>9} {'mean ms':>9}")
+    for kind in ("model", "tool"):
+        for name, s in sorted(snapshot["calls"].get(kind, {}).items(), key=lambda kv: -kv[1]["seconds_total"]):
+            print(f"{kind:<6} {name:<28} {s['calls']:>6} {s['errors']:>6} "
+                  f"{s['seconds_total']:>9.3f} {s['seconds_mean'] * 1000:>9.1f}")
+    for name, value in sorted(snapshot["counters"].items()):
+        print(f"{name}: {value:g}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake model call")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="seconds per fake search")
+    parser.add_argument("--transcribe-latency", type=float, default=0.5, help="seconds per fake transcription")
+    parser.add_argument("--search-rate", type=float, default=None,
+                        help="override the search rate limit (requests/sec); default keeps SEARCH_RATE_PER_SEC")
+    parser.add_argument("--attachment-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--task-timeout", type=float, default=120)
+    parser.add_argument("--llm-cache", choices=("record", "replay", "passthrough"), default="passthrough",
+                        help="put the LLM response cache (LLM_CACHE_PATH) in front of the fake model")
+    parser.add_argument("--verbose", action="store_true", help="show agent logs")
+    args = parser.parse_args()
+
+    questions, files, expected = make_questions(args.tasks, args.attachment_bytes)
+    install_stubs(args.search_latency, args.transcribe_latency, args.search_rate)
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp, FakeScoringAPI(questions, files, expected) as api:
+        pipeline.answer_cache = DiskCache(f"{tmp}/answers.sqlite")
+        audio.transcript_cache = DiskCache(f"{tmp}/transcripts.sqlite")
+        files_dir = os.path.join(tempfile.gettempdir(), "bench-pipeline-files")
+        shutil.rmtree(files_dir, ignore_errors=True)
+        pipeline.attachment_store = AttachmentStore(files_dir)
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            elapsed, status, df = asyncio.run(run(args, api, os.path.join(tmp, "metrics")))
+    report(elapsed, status, df, args.tasks)
+
+
+if __name__ == "__main__":
+    main()
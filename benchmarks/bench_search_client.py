@@ -0,0 +1,67 @@
+"""
+Per-query search client overhead: a new DuckDuckGoSearchTool per call versus the shared pool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search_client              # client setup cost only, offline
+    python -m benchmarks.bench_search_client --live "python release date" --iterations 5
+
+Offline mode measures only what happens before the request is sent. Live
+mode also sends real queries, bypassing the result cache and rate limiter,
+so keep ``--iterations`` small.
+"""
+import argparse
+import statistics
+import time
+
+from smolagents import DuckDuckGoSearchTool
+from tools.web import SearchClientPool
+
+
+def _measure(iterations: int, get_client, query: str | None) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with get_client() as client:
+            if query:
+                client.forward(query)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    print(
+        f"{label:<14} mean {statistics.mean(timings) * 1000:9.3f} ms"
+        f"   median {statistics.median(timings) * 1000:9.3f} ms"
+        f"   max {max(timings) * 1000:9.3f} ms"
+    )
+
+
+class _FreshClient:
+    """Context manager that mimics the old behaviour: one new client per call."""
+
+    def __enter__(self):
+        return DuckDuckGoSearchTool()
+
+    def __exit__(self, *exc):
+        return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--live", metavar="QUERY", help="also send this query on every iteration")
+    args = parser.parse_args()
+
+    pool = SearchClientPool(max_size=1)
+    before = _measure(args.iterations, _FreshClient, args.live)
+    after = _measure(args.iterations, pool.client, args.live)
+
+    print(f"{args.iterations} iterations, {'live query' if args.live else 'client setup only'}")
+    _report("new per call", before)
+    _report("pooled", after)
+    print(f"pooled clients created: {pool.created}")
+
+
+if __name__ == "__main__":
+    main()
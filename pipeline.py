@@ -0,0 +1,363 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from agent import AgentPool
+from smolagents import OpenAIServerModel
+from tools.attachments import AttachmentStore
+from tools.cache import DiskCache, sha256_file, sha256_text
+from tools.llm_cache import CachingModel, LLM_CACHE_MODE
+from tools.http_client import AsyncHttpClient, get_async_http_client
+from tools.metrics import metrics
+from tools.audio import get_transcript_cache
+from tools.web import search_cache
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEFAULT_API_URL = "https://agents-course-unit4-scoring.hf.space"
+MODEL_ID = "gpt-4.1-2025-04-14"
+MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "4"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "8"))
+DOWNLOAD_MAX_TRIES = int(os.getenv("DOWNLOAD_MAX_TRIES", "3"))
+TASK_TIMEOUT = float(os.getenv("TASK_TIMEOUT_S", "600"))
+RUN_BUDGET = float(os.getenv("RUN_BUDGET_S", "0"))  # 0 means unlimited
+# Extra time given to a timed-out run to stop at its next step before its worker slot is reclaimed
+TIMEOUT_GRACE = float(os.getenv("TIMEOUT_GRACE_S", "30"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join("cache", "answers.sqlite"))
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "downloaded_files")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(1 << 30)))
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+# Opened on first use, so importing this module creates no files; assign either one to use another store
+answer_cache: DiskCache | None = None
+attachment_store: AttachmentStore | None = None
+_stores_lock = threading.Lock()
+
+
+def get_answer_cache() -> DiskCache:
+    global answer_cache
+    with _stores_lock:
+        if answer_cache is None:
+            answer_cache = DiskCache(ANSWER_CACHE_PATH)
+        return answer_cache
+
+
+def get_attachment_store() -> AttachmentStore:
+    global attachment_store
+    with _stores_lock:
+        if attachment_store is None:
+            attachment_store = AttachmentStore(ATTACHMENT_DIR, max_bytes=ATTACHMENT_MAX_BYTES)
+        return attachment_store
+
+
+def build_model():
+    """Build the model client, wrapped in the LLM response cache unless LLM_CACHE_MODE is passthrough."""
+    api_key = os.getenv("clave_open_ai", "").strip()
+    model = OpenAIServerModel(model_id=MODEL_ID, api_key=api_key)
+    if LLM_CACHE_MODE != "passthrough":
+        model = CachingModel(model, mode=LLM_CACHE_MODE)
+    return model
+
+
+def answer_cache_key(task_id: str, question: str, file_path: str | None, model_id: str) -> str:
+    """Cache key for an answer: the task id plus a hash of everything the answer depends on."""
+    file_digest = sha256_file(file_path) if file_path and os.path.exists(file_path) else ""
+    return f"{task_id}:{sha256_text(question, file_digest, model_id)}"
+
+
+async def fetch_attachment(
+    client: AsyncHttpClient, api_url: str, tid: str, file_name: str, slots: asyncio.Semaphore,
+    spans: dict | None = None,
+) -> str | None:
+    """
+    Return the local path of a task's attachment, downloading it into the store if needed.
+    The fetch is recorded in ``spans[tid]`` so it can be added to the question's trace.
+    """
+    start = time.perf_counter()
+    started_at = time.time()
+    store = get_attachment_store()
+
+    def _record(**attrs):
+        if spans is not None:
+            spans[tid] = [("attachment.fetch", "io", started_at, time.time(), dict(file_name=file_name, **attrs))]
+
+    path = await asyncio.to_thread(store.get, tid, file_name)
+    if path is not None:
+        _record(cached=True)
+        return path
+    tmp_path = store.temp_path(tid)
+    try:
+        async with slots:
+            size = await client.download(f"{api_url}/files/{tid}", tmp_path, max_tries=DOWNLOAD_MAX_TRIES)
+        path = await asyncio.to_thread(store.put, tid, file_name, tmp_path)
+    except Exception as e:
+        logger.warning(f"Attachment {file_name} for task {tid} failed after {time.perf_counter() - start:.2f}s: {e}")
+        _record(cached=False, error=f"{type(e).__name__}: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _record(cached=False, bytes=size)
+    logger.info(f"Attachment {file_name} for task {tid} ready in {time.perf_counter() - start:.2f}s")
+    return path
+
+
+def export_metrics(directory: str | None = None) -> str:
+    """Write the run's tool/model metrics as JSON and Prometheus text (default: METRICS_DIR); returns the JSON path."""
+    directory = directory or METRICS_DIR
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = metrics.dump(os.path.join(directory, f"run-{stamp}.json"))
+    with open(os.path.join(directory, "latest.prom"), "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus())
+    for kind, series in metrics.snapshot()["calls"].items():
+        for name, s in series.items():
+            logger.info(
+                f"{kind} {name}: {s['calls']} calls, {s['errors']} errors, "
+                f"mean {s['seconds_mean']:.2f}s, total {s['seconds_total']:.1f}s"
+            )
+    return path
+
+
+def task_row(tid: str, answer: str, status: str, latency: float = 0.0, steps: int = 0) -> dict:
+    return {
+        "Task ID": tid,
+        "Answer": answer,
+        "Status": status,
+        "Cached": status == "cached",
+        "Latency (s)": round(latency, 2),
+        "Steps": steps,
+    }
+
+
+def answer_question(
+    agents: AgentPool,
+    item: dict,
+    path: str | None = None,
+    force_recompute: bool = False,
+    timeout: float | None = None,
+    spans: list | None = None,
+):
+    """Answer a single question with an agent borrowed from ``agents``.
+
+    Each agent is used by one worker at a time and reset when returned, so
+    its ``CodeAgent`` memory never mixes steps from two questions. Answers
+    already in ``answer_cache`` are reused unless ``force_recompute`` is set.
+    A run longer than ``timeout`` seconds is interrupted and reported as a
+    timeout. ``spans`` are finished operations (such as the attachment
+    prefetch) added to the question's trace. Returns the DataFrame row and the submission entry (``None``
+    when the agent failed).
+    """
+    tid = item.get("task_id")
+    text = item.get("question", "")
+    start = time.perf_counter()
+    steps = 0
+    try:
+        key = answer_cache_key(tid, text, path, agents.model.model_id)
+        ans = None if force_recompute else get_answer_cache().get(key)
+        cached = ans is not None
+        if not cached:
+            with agents.agent() as agent:
+                try:
+                    ans = str(agent(text, path, timeout=timeout, trace_id=tid, spans=spans))
+                finally:
+                    steps = agent.last_step_count
+            get_answer_cache().set(key, ans)
+        latency = time.perf_counter() - start
+        logger.info(f"Answered task {tid} in {latency:.1f}s, {steps} steps{' (cached)' if cached else ''}")
+        row = task_row(tid, ans, "cached" if cached else "ok", latency, steps)
+        return row, {"task_id": tid, "submitted_answer": ans}
+    except TimeoutError as e:
+        latency = time.perf_counter() - start
+        logger.warning(f"Timeout on {tid} after {latency:.1f}s, {steps} steps")
+        return task_row(tid, f"TIMEOUT: {e}", "timeout", latency, steps), None
+    except Exception as e:
+        latency = time.perf_counter() - start
+        logger.warning(f"Agent error on {tid} after {latency:.1f}s: {e}")
+        return task_row(tid, f"ERROR: {e}", "error", latency, steps), None
+
+
+async def run_evaluation(
+    agents: AgentPool,
+    username: str,
+    agent_code: str,
+    api_url: str = DEFAULT_API_URL,
+    max_workers: int = MAX_WORKERS,
+    force_recompute: bool = False,
+    task_timeout: float = TASK_TIMEOUT,
+    run_budget: float = RUN_BUDGET,
+    metrics_dir: str | None = None,
+):
+    """Fetch the questions, answer them and submit the answers.
+
+    Yields ``(status, DataFrame)`` after every finished task, then once more
+    with the submission result, so callers can show progress while the run
+    is going. The DataFrame lists finished tasks in question order.
+
+    Scoring-API calls and attachment downloads run on the event loop over the
+    process-wide pooled async client. Downloads for every task start as soon
+    as the questions arrive. Agent runs are blocking, so they go to a thread
+    pool of ``max_workers``; each one starts once its own attachment is ready.
+
+    Each agent run is interrupted after ``task_timeout`` seconds. If it has
+    not stopped ``TIMEOUT_GRACE`` seconds later, it is recorded as a timeout
+    and its worker slot goes to the next task. Both limits count from the
+    moment the run gets a thread, so a task queued behind abandoned runs is
+    never reported as timed out before it starts. Once ``run_budget`` seconds
+    have passed (0 disables the budget), tasks that have not started are
+    skipped. Timed-out and skipped tasks are not submitted.
+
+    The run's metrics are written to ``metrics_dir`` (default METRICS_DIR).
+    """
+    max_workers = max(1, int(max_workers))
+    # Metrics cover one run at a time
+    metrics.reset()
+    # The search and transcript caches count since the process started; report this run's share
+    search_start = (search_cache.hits, search_cache.misses)
+    transcript_cache = get_transcript_cache()
+    transcript_start = (transcript_cache.hits, transcript_cache.misses)
+    client = get_async_http_client()
+    client.reset_stats()
+    # Fetch questions
+    questions_url = f"{api_url}/questions"
+    logger.info(f"Fetching questions from: {questions_url}")
+    try:
+        resp = await client.get(questions_url, timeout=15)
+        resp.raise_for_status()
+        questions = resp.json()
+        logger.info(f"Fetched {len(questions)} questions.")
+    except Exception as e:
+        logger.error(f"Failed to fetch questions: {e}")
+        yield f"Fetch error: {e}", None
+        return
+    yield f"Fetched {len(questions)} questions, answering with {max_workers} workers...", None
+
+    loop = asyncio.get_running_loop()
+    download_slots = asyncio.Semaphore(PREFETCH_WORKERS)
+    attachment_spans = {}
+    # Files of this run must survive eviction by its own later downloads
+    attachment_ids = [item["task_id"] for item in questions if item.get("file_name")]
+    get_attachment_store().pin(attachment_ids)
+    attachments = {
+        item["task_id"]: asyncio.create_task(
+            fetch_attachment(
+                client, api_url, item["task_id"], item["file_name"], download_slots, attachment_spans
+            )
+        )
+        for item in questions
+        if item.get("file_name")
+    }
+
+    outcomes = [None] * len(questions)
+    run_start = time.perf_counter()
+    task_timeout = task_timeout or None
+    worker_slots = asyncio.Semaphore(max_workers)
+    # Headroom for runs that are still winding down after their slot was reclaimed
+    executor = ThreadPoolExecutor(max_workers=2 * max_workers)
+    abandoned = []
+
+    async def _answer(index, item):
+        attachment = attachments.get(item.get("task_id"))
+        path = await attachment if attachment is not None else None
+        async with worker_slots:
+            if run_budget and time.perf_counter() - run_start > run_budget:
+                return index, (task_row(item.get("task_id"), "SKIPPED: run budget exhausted", "skipped"), None)
+            started = asyncio.Event()
+
+            def _run():
+                loop.call_soon_threadsafe(started.set)
+                return answer_question(
+                    agents, item, path, force_recompute, task_timeout, attachment_spans.get(item.get("task_id"))
+                )
+
+            run = loop.run_in_executor(executor, _run)
+            # Abandoned runs can hold every spare thread; the hard limit only counts once this run has one
+            await started.wait()
+            start = time.perf_counter()
+            try:
+                hard_limit = task_timeout + TIMEOUT_GRACE if task_timeout else None
+                return index, await asyncio.wait_for(asyncio.shield(run), hard_limit)
+            except asyncio.TimeoutError:
+                latency = time.perf_counter() - start
+                abandoned.append(run)
+                still_running = sum(1 for r in abandoned if not r.done())
+                logger.warning(
+                    f"Task {item.get('task_id')} did not stop after {latency:.0f}s; freeing its worker "
+                    f"({still_running} abandoned runs still hold a thread)"
+                )
+                row = task_row(item.get("task_id"), f"TIMEOUT: no answer after {latency:.0f}s", "timeout", latency)
+                return index, (row, None)
+
+    pending = []
+    try:
+        pending = [asyncio.create_task(_answer(i, item)) for i, item in enumerate(questions)]
+        for done_count, finished in enumerate(asyncio.as_completed(pending), start=1):
+            index, outcome = await finished
+            outcomes[index] = outcome
+            row = outcome[0]
+            progress = (
+                f"Answered {done_count}/{len(questions)} in {time.perf_counter() - run_start:.0f}s "
+                f"(last: {row['Task ID']} {row['Status']}, {row['Latency (s)']:.1f}s, {row['Steps']} steps)"
+            )
+            yield progress, pd.DataFrame([o[0] for o in outcomes if o is not None])
+    finally:
+        # When the caller stops early, stop the remaining downloads and runs before their files are released
+        leftovers = [*pending, *attachments.values()]
+        for task in leftovers:
+            task.cancel()
+        await asyncio.gather(*leftovers, return_exceptions=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        get_attachment_store().unpin(attachment_ids)
+
+    results = [row for row, _ in outcomes]
+    answers_payload = [payload for _, payload in outcomes if payload is not None]
+    cache_hits = sum(1 for row in results if row["Cached"])
+    timeouts = sum(1 for row in results if row["Status"] == "timeout")
+    skipped = sum(1 for row in results if row["Status"] == "skipped")
+    cache_status = (
+        f"Answer cache: {cache_hits} hits, {len(results) - cache_hits - skipped} misses | "
+        f"Search cache: {search_cache.hits - search_start[0]} hits, {search_cache.misses - search_start[1]} misses | "
+        f"Transcript cache: {transcript_cache.hits - transcript_start[0]} hits, "
+        f"{transcript_cache.misses - transcript_start[1]} misses | "
+        f"{timeouts} timed out, {skipped} skipped"
+    )
+    logger.info(cache_status)
+
+    # Submit everything once
+    submission = {
+        "username": username,
+        "agent_code": agent_code,
+        "answers": answers_payload
+    }
+    submit_url = f"{api_url}/submit"
+    logger.info(f"Submitting {len(answers_payload)} answers...")
+    yield f"Submitting {len(answers_payload)} answers...\n{cache_status}", pd.DataFrame(results)
+    try:
+        r = await client.post(submit_url, json=submission, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+        status = (
+            f"Submission Successful: {data.get('score')}% "
+            f"({data.get('correct_count')}/{data.get('total_attempted')})"
+        )
+        logger.info(status)
+    except Exception as e:
+        logger.error(f"Submission failed: {e}")
+        status = f"Submit error: {e}"
+    status = f"{status}\n{cache_status}"
+    try:
+        status = f"{status}\nMetrics: {export_metrics(metrics_dir)}"
+    except OSError as e:
+        logger.warning(f"Could not write metrics: {e}")
+    for endpoint, timing in client.stats().items():
+        logger.info(
+            f"HTTP {endpoint}: {timing['count']} calls, {timing['errors']} errors, "
+            f"{timing['retries']} retries, mean {timing['mean_s']:.2f}s, max {timing['max_s']:.2f}s"
+        )
+
+    yield status, pd.DataFrame(results)
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+from tools.cache import sha256_file
+
+
+class AttachmentStore:
+    """
+    Content-addressed store for task attachments.
+
+    Files are kept once per SHA-256 digest under ``blobs/``. An index maps
+    each task_id to its digest and original filename, and every task gets a
+    view at ``tasks/<task_id>/<filename>`` (a hard link, or a copy where links
+    are not supported). Tasks that reuse a filename therefore never collide,
+    and identical content is stored once. Blob sizes are checked on every
+    lookup and digests are re-verified the first time a blob is used in this
+    process. When ``max_bytes`` is set, the least recently used blobs are
+    evicted once the store grows past it. Attachments of tasks passed to
+    ``pin`` are never evicted until they are unpinned, so a run's prefetched
+    files stay in place until its agents are done with them.
+
+    Example:
+        >>> store = AttachmentStore("downloaded_files", max_bytes=500 * 2**20)
+        >>> path = store.get("task-1", "sales.xlsx") or store.put("task-1", "sales.xlsx", downloaded_path)
+        >>> print(path)
+        'downloaded_files/tasks/task-1/sales.xlsx'
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._verified = set()
+        self._pins = Counter()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return {"tasks": index.get("tasks", {}), "blobs": index.get("blobs", {})}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"tasks": {}, "blobs": {}}
+
+    def _save_index(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".index-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _view_path(self, task_id: str, filename: str) -> str:
+        return os.path.join(self.root, "tasks", task_id, os.path.basename(filename))
+
+    def _link_view(self, digest: str, view: str) -> None:
+        blob = self._blob_path(digest)
+        if os.path.exists(view):
+            if os.path.samefile(view, blob) or sha256_file(view) == digest:
+                return
+            os.remove(view)
+        os.makedirs(os.path.dirname(view), exist_ok=True)
+        try:
+            os.link(blob, view)
+        except OSError:
+            shutil.copyfile(blob, view)
+
+    def _is_intact(self, digest: str) -> bool:
+        blob = self._blob_path(digest)
+        meta = self._index["blobs"].get(digest)
+        if meta is None or not os.path.exists(blob) or os.path.getsize(blob) != meta["size"]:
+            return False
+        if digest not in self._verified:
+            if sha256_file(blob) != digest:
+                return False
+            self._verified.add(digest)
+        return True
+
+    def _forget_blob(self, digest: str) -> None:
+        self._index["blobs"].pop(digest, None)
+        self._verified.discard(digest)
+        for task_id, entry in list(self._index["tasks"].items()):
+            if entry["digest"] == digest:
+                del self._index["tasks"][task_id]
+                view = self._view_path(task_id, entry["filename"])
+                if os.path.exists(view):
+                    os.remove(view)
+        blob = self._blob_path(digest)
+        if os.path.exists(blob):
+            os.remove(blob)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        if self.max_bytes is None:
+            return
+        blobs = self._index["blobs"]
+        tasks = self._index["tasks"]
+        protected = {keep} | {tasks[task_id]["digest"] for task_id in self._pins if task_id in tasks}
+        total = sum(meta["size"] for meta in blobs.values())
+        for digest in sorted(blobs, key=lambda d: blobs[d]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            if digest not in protected:
+                total -= blobs[digest]["size"]
+                self._forget_blob(digest)
+
+    def pin(self, task_ids: Iterable[str]) -> None:
+        """Keep the attachments of ``task_ids``, present or still to come, out of eviction."""
+        with self._lock:
+            self._pins.update(task_ids)
+
+    def unpin(self, task_ids: Iterable[str]) -> None:
+        """Release ``pin`` and evict whatever the pins were holding past ``max_bytes``."""
+        with self._lock:
+            self._pins.subtract(task_ids)
+            self._pins = +self._pins
+            self._evict()
+            self._save_index()
+
+    def get(self, task_id: str, filename: str) -> Optional[str]:
+        """Return the local path of an intact attachment for ``task_id``, or None."""
+        with self._lock:
+            entry = self._index["tasks"].get(task_id)
+            if entry is None or entry["filename"] != filename:
+                return None
+            digest = entry["digest"]
+            if not self._is_intact(digest):
+                self._forget_blob(digest)
+                self._save_index()
+                return None
+            self._index["blobs"][digest]["accessed"] = time.time()
+            view = self._view_path(task_id, filename)
+            self._link_view(digest, view)
+            return view
+
+    def put(self, task_id: str, filename: str, src_path: str) -> str:
+        """Move ``src_path`` into the store for ``task_id`` and return the task's view path."""
+        digest = sha256_file(src_path)
+        size = os.path.getsize(src_path)
+        with self._lock:
+            blob = self._blob_path(digest)
+            if self._index["blobs"].get(digest) is not None and self._is_intact(digest):
+                os.remove(src_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(src_path, blob)
+                self._verified.add(digest)
+            self._index["blobs"][digest] = {"size": size, "accessed": time.time()}
+            self._index["tasks"][task_id] = {"digest": digest, "filename": filename}
+            view = self._view_path(task_id, filename)
+            self._link_view(digest, view)
+            self._evict(keep=digest)
+            self._save_index()
+            return view
+
+    def temp_path(self, task_id: str) -> str:
+        """Reserve a scratch path inside the store to download ``task_id``'s attachment into."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"), prefix=f"{task_id}-")
+        os.close(fd)
+        return tmp_path
@@ -1,13 +1,327 @@
-import speech_recognition as sr
+import json
+import math
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import backoff
+import speech_recognition as sr
 from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
 from smolagents import tool
+from tools import tracing
+from tools.cache import DiskCache, sha256_file, sha256_text
+from tools.speech import SpeechBackend, get_backend, recognize
+
+try:
+  import webrtcvad
+except ImportError:
+  webrtcvad = None
+
+# Recordings longer than this are split and transcribed chunk by chunk
+TRANSCRIBE_CHUNK_MS = int(os.getenv("TRANSCRIBE_CHUNK_MS", "30000"))
+TRANSCRIBE_OVERLAP_MS = int(os.getenv("TRANSCRIBE_OVERLAP_MS", "500"))
+TRANSCRIBE_SPLIT = os.getenv("TRANSCRIBE_SPLIT", "silence")  # "silence" or "fixed"
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+TRANSCRIBE_MAX_TRIES = int(os.getenv("TRANSCRIBE_MAX_TRIES", "3"))
+
+# Preprocessing before recognition: 16 kHz mono 16-bit, silences trimmed by voice-activity detection
+TRANSCRIBE_SAMPLE_RATE = int(os.getenv("TRANSCRIBE_SAMPLE_RATE", "16000"))
+TRANSCRIBE_VAD = os.getenv("TRANSCRIBE_VAD", "1") == "1"
+TRANSCRIBE_VAD_MODE = int(os.getenv("TRANSCRIBE_VAD_MODE", "2"))  # webrtcvad aggressiveness, 0-3
+TRANSCRIBE_MAX_SILENCE_MS = int(os.getenv("TRANSCRIBE_MAX_SILENCE_MS", "700"))
+VAD_FRAME_MS = 30
+SPEECH_PAD_MS = 200
+NOISE_MARGIN_DB = 10
+# The noise floor is only trusted this far below the speech level; closer than that it is quiet speech
+MIN_SPEECH_CONTRAST_DB = 20
+
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join("cache", "transcripts.sqlite"))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(64 * 2**20)))
+
+FAILED_CHUNK = "[inaudible]"
+# Upper bound on speaking rate, used to size the word match at overlapping chunk boundaries
+WORDS_PER_SECOND = 3
+
+# Transcripts by audio content and recognition settings, shared across runs.
+# Opened on first use, so importing this module creates no files.
+transcript_cache: DiskCache | None = None
+_transcript_cache_lock = threading.Lock()
+
 
+def get_transcript_cache() -> DiskCache:
+  global transcript_cache
+  with _transcript_cache_lock:
+    if transcript_cache is None:
+      transcript_cache = DiskCache(TRANSCRIPT_CACHE_PATH, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES)
+    return transcript_cache
 
+
+def transcript_cache_key(path: str, backend: SpeechBackend) -> str:
+  """Cache key for a transcript: the audio's SHA-256 plus a hash of everything that changes the text."""
+  settings = dict(
+    backend.settings(), chunk_ms=TRANSCRIBE_CHUNK_MS, overlap_ms=TRANSCRIBE_OVERLAP_MS, split=TRANSCRIBE_SPLIT,
+    sample_rate=TRANSCRIBE_SAMPLE_RATE, vad=TRANSCRIBE_VAD and ("webrtc" if webrtcvad else "energy"),
+    vad_mode=TRANSCRIBE_VAD_MODE, max_silence_ms=TRANSCRIBE_MAX_SILENCE_MS,
+  )
+  return f"{sha256_file(path)}:{sha256_text(json.dumps(settings, sort_keys=True))}"
+
+
+def decode_audio(path: str) -> AudioSegment:
+  """
+  Decode an audio file with ffmpeg. pydub reads the decoded PCM from the
+  ffmpeg pipe, so nothing is written to disk.
+  """
+  with tracing.span("ffmpeg.decode", "audio", path=path):
+    return AudioSegment.from_file(path)
+
+
+def silence_threshold(audio: AudioSegment, frame_ms: int = VAD_FRAME_MS, percentile: float = 10) -> float:
+  """
+  Level in dBFS below which ``audio`` counts as silence: the noise floor (a
+  low percentile of per-frame loudness) plus a margin. Unlike
+  ``adjust_for_ambient_noise`` this reads the whole clip and consumes nothing.
+  A clip without real pauses has no noise floor to find: when the percentile
+  is not at least MIN_SPEECH_CONTRAST_DB under the speech level (the matching
+  high percentile) it is quiet speech, and the threshold goes under the
+  quietest frame so nothing is cut.
+  """
+  levels = sorted(
+    max(audio[i:i + frame_ms].dBFS, -96.0) for i in range(0, len(audio) - frame_ms + 1, frame_ms)
+  )
+  if not levels or math.isinf(audio.dBFS):
+    return -96.0
+  floor = levels[min(len(levels) - 1, int(len(levels) * percentile / 100))]
+  speech = levels[max(0, int(len(levels) * (100 - percentile) / 100) - 1)]
+  if speech - floor < MIN_SPEECH_CONTRAST_DB:
+    return max(-96.0, levels[0] - NOISE_MARGIN_DB)
+  threshold = floor + NOISE_MARGIN_DB
+  return threshold if threshold < audio.dBFS else audio.dBFS - 16
+
+
+def uses_vad(audio: AudioSegment) -> bool:
+  """Whether ``speech_regions`` can run webrtcvad on ``audio`` rather than the energy threshold."""
+  return webrtcvad is not None and audio.sample_width == 2 and audio.frame_rate in (8000, 16000, 32000, 48000)
+
+
+def speech_regions(audio: AudioSegment, threshold: float, min_silence_ms: int = 300) -> list:
+  """
+  Return (start_ms, end_ms) spans containing speech. Uses webrtcvad when it is
+  installed (``audio`` must be 16-bit mono at 8/16/32/48 kHz) and falls back
+  to an energy threshold otherwise. Gaps shorter than ``min_silence_ms`` are
+  bridged.
+  """
+  if not uses_vad(audio):
+    return detect_nonsilent(audio, min_silence_len=min_silence_ms, silence_thresh=threshold)
+  vad = webrtcvad.Vad(TRANSCRIBE_VAD_MODE)
+  frame_bytes = audio.frame_rate * audio.sample_width * VAD_FRAME_MS // 1000
+  raw = audio.raw_data
+  regions = []
+  for i in range(0, len(raw) - frame_bytes + 1, frame_bytes):
+    if not vad.is_speech(raw[i:i + frame_bytes], audio.frame_rate):
+      continue
+    start = i // frame_bytes * VAD_FRAME_MS
+    if regions and start - regions[-1][1] < min_silence_ms:
+      regions[-1][1] = start + VAD_FRAME_MS
+    else:
+      regions.append([start, start + VAD_FRAME_MS])
+  return regions
+
+
+def trim_silence(audio: AudioSegment, regions: list, pad_ms: int = SPEECH_PAD_MS,
+                 max_silence_ms: int | None = TRANSCRIBE_MAX_SILENCE_MS) -> AudioSegment:
+  """
+  Drop the silence before the first and after the last speech region, and
+  shorten pauses between regions to at most ``max_silence_ms`` (None keeps
+  them whole).
+  """
+  if not regions:
+    return audio
+  if max_silence_ms is None:
+    start, end = max(0, regions[0][0] - pad_ms), min(len(audio), regions[-1][1] + pad_ms)
+    return audio[start:end]
+  spans = []
+  for start, end in regions:
+    start, end = max(0, start - pad_ms), min(len(audio), end + pad_ms)
+    if spans and start <= spans[-1][1]:
+      spans[-1][1] = max(spans[-1][1], end)
+    else:
+      spans.append([start, end])
+  out = audio[spans[0][0]:spans[0][1]]
+  for (_, prev_end), (start, end) in zip(spans, spans[1:]):
+    gap = start - prev_end
+    if gap > max_silence_ms:
+      out += AudioSegment.silent(max_silence_ms, frame_rate=audio.frame_rate).set_sample_width(audio.sample_width)
+    else:
+      out += audio[prev_end:start]
+    out += audio[start:end]
+  return out
+
+
+def preprocess(audio: AudioSegment) -> AudioSegment:
+  """
+  Convert to TRANSCRIBE_SAMPLE_RATE mono 16-bit and, unless TRANSCRIBE_VAD is
+  off, trim leading and trailing silence. Long internal pauses are shortened
+  only when webrtcvad tells speech from silence; the energy fallback cannot
+  tell a pause from a quiet passage. Smaller payloads upload and decode
+  faster on every backend.
+  """
+  with tracing.span("audio.preprocess", "audio", seconds_in=len(audio) / 1000) as trace_span:
+    audio = audio.set_channels(1).set_frame_rate(TRANSCRIBE_SAMPLE_RATE).set_sample_width(2)
+    if TRANSCRIBE_VAD:
+      regions = speech_regions(audio, silence_threshold(audio))
+      audio = trim_silence(audio, regions, max_silence_ms=TRANSCRIBE_MAX_SILENCE_MS if uses_vad(audio) else None)
+    if trace_span is not None:
+      trace_span.set(seconds_out=len(audio) / 1000)
+    return audio
+
+
+def fixed_windows(length_ms: int, window_ms: int, overlap_ms: int = 0) -> list:
+  """
+  Split ``length_ms`` into windows of ``window_ms`` that overlap by ``overlap_ms``.
+  Example:
+    >>> fixed_windows(25000, 10000, 500)
+    [(0, 10000), (9500, 19500), (19000, 25000)]
+  """
+  step = max(1, window_ms - overlap_ms)
+  windows = []
+  start = 0
+  while True:
+    end = min(length_ms, start + window_ms)
+    windows.append((start, end))
+    if end >= length_ms:
+      return windows
+    start += step
+
+
+def silence_windows(audio: AudioSegment, max_ms: int, overlap_ms: int = 0,
+                    min_silence_ms: int = 500, keep_silence_ms: int = 200) -> list:
+  """
+  Split ``audio`` into windows of at most ``max_ms`` that start and end in
+  silence. Consecutive speech runs are packed into one window while they fit;
+  a run longer than ``max_ms`` is cut into overlapping fixed windows. Only
+  those pieces overlap; windows split on silence share no audio.
+  """
+  speech = detect_nonsilent(audio, min_silence_len=min_silence_ms, silence_thresh=silence_threshold(audio))
+  if not speech:
+    return fixed_windows(len(audio), max_ms, overlap_ms)
+  windows = []
+  current = None
+  for start, end in speech:
+    start, end = max(0, start - keep_silence_ms), min(len(audio), end + keep_silence_ms)
+    if current is not None and end - current[0] <= max_ms:
+      current = (current[0], end)
+      continue
+    if current is not None:
+      windows.append(current)
+    if end - start > max_ms:
+      pieces = [(start + s, start + e) for s, e in fixed_windows(end - start, max_ms, overlap_ms)]
+      windows.extend(pieces[:-1])
+      current = pieces[-1]
+    else:
+      current = (start, end)
+  windows.append(current)
+  return windows
+
+
+def window_overlaps(windows: list) -> list:
+  """
+  Milliseconds each window shares with the one before it (0 for the first).
+  Example:
+    >>> window_overlaps([(0, 10000), (9500, 19500), (20500, 25000)])
+    [0, 500, 0]
+  """
+  return [0] + [max(0, prev[1] - cur[0]) for prev, cur in zip(windows, windows[1:])]
+
+
+def stitch(texts: list, overlaps: list | None = None) -> str:
+  """
+  Join chunk transcripts in order. Where a chunk's window overlapped the one
+  before it (``overlaps``, in ms, as from ``window_overlaps``), words repeated
+  across that boundary are dropped; at most the number of words that fit in
+  the overlap are compared. Empty transcripts break adjacency.
+  Example:
+    >>> stitch(["the quick brown fox", "brown fox jumps over"], [0, 500])
+    'the quick brown fox jumps over'
+    >>> stitch(["I said no", "no means no"], [0, 0])
+    'I said no no means no'
+  """
+  overlaps = overlaps or [0] * len(texts)
+  words = []
+  adjacent = False
+  for text, overlap_ms in zip(texts, overlaps):
+    new = text.split()
+    if not new:
+      adjacent = False
+      continue
+    repeated = 0
+    if adjacent and overlap_ms > 0:
+      max_words = math.ceil(overlap_ms / 1000 * WORDS_PER_SECOND) + 1
+      for n in range(min(max_words, len(words), len(new)), 0, -1):
+        if [w.lower() for w in words[-n:]] == [w.lower() for w in new[:n]]:
+          repeated = n
+          break
+    words.extend(new[repeated:])
+    adjacent = True
+  return re.sub(r"\s+", " ", " ".join(words)).strip()
+
+
+def _recognize_chunk(segment: AudioSegment, index: int, max_tries: int, backend: SpeechBackend) -> str:
+  """Transcribe one chunk, retrying API errors with exponential backoff."""
+  audio_data = sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
+
+  @backoff.on_exception(backoff.expo, sr.RequestError, max_tries=max_tries)
+  def _recognize():
+    return recognize(audio_data, backend, chunk=index)
+
+  try:
+    return _recognize()
+  except sr.UnknownValueError:
+    return ""
+  except sr.RequestError as e:
+    print(f"Chunk {index} failed after {max_tries} tries: {e}")
+    return FAILED_CHUNK
+
+
+def transcribe_chunked(audio: AudioSegment, chunk_ms: int = TRANSCRIBE_CHUNK_MS,
+                       overlap_ms: int = TRANSCRIBE_OVERLAP_MS, split: str = TRANSCRIBE_SPLIT,
+                       workers: int = TRANSCRIBE_WORKERS, max_tries: int = TRANSCRIBE_MAX_TRIES,
+                       backend: SpeechBackend | None = None) -> str:
+  """
+  Transcribe long audio in chunks split on silence (or fixed windows), at most
+  ``workers`` at a time; CPU-bound backends are further limited by the size of
+  their process pool. Chunks are retried on their own; one that still fails
+  shows up as "[inaudible]" in the stitched text instead of failing the file.
+  Raises:
+    ValueError: If no chunk could be transcribed.
+  """
+  backend = backend or get_backend()
+  audio = audio.set_channels(1)
+  if split == "silence":
+    windows = silence_windows(audio, chunk_ms, overlap_ms)
+  else:
+    windows = fixed_windows(len(audio), chunk_ms, overlap_ms)
+  recognize_chunk = tracing.carry(_recognize_chunk)
+  with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+    texts = list(pool.map(
+      lambda item: recognize_chunk(audio[item[1][0]:item[1][1]], item[0], max_tries, backend), enumerate(windows)
+    ))
+  if all(text in ("", FAILED_CHUNK) for text in texts):
+    if FAILED_CHUNK in texts:
+      raise ValueError(f"Could not process audio; all {len(texts)} chunks failed.")
+    raise ValueError("Could not understand the audio.")
+  return stitch(texts, window_overlaps(windows))
+
+
+# The docstring below is the tool description shown to the model, so operator notes live here:
+# the engine is chosen with TRANSCRIBE_BACKEND (google, whisper or sphinx); audio is resampled to
+# 16 kHz mono and silences are trimmed before recognition; recordings longer than TRANSCRIBE_CHUNK_MS
+# are split on silence and transcribed in parallel chunks; transcripts are cached by file content.
 @tool
 def transcribe_audio(mp3_path: str) -> str:
   """
   Transcribes text from an MP3 audio file using speech recognition.
+  Parts of a long recording that could not be recognized appear as "[inaudible]".
   Args:
     mp3_path (str): Path to the MP3 file to be transcribed.
   Returns:
@@ -25,32 +339,35 @@ def transcribe_audio(mp3_path: str) -> str:
   if not os.path.exists(mp3_path):
     raise FileNotFoundError(f"The file {mp3_path} does not exist.")
 
-  # Initialize recognizer
-  recognizer = sr.Recognizer()
+  backend = get_backend()
+
+  # Known audio is answered from the cache without decoding
+  key = transcript_cache_key(mp3_path, backend)
+  transcript_cache = get_transcript_cache()
+  text = transcript_cache.get(key)
+  if text is not None:
+    return text
 
   try:
-    # Convert MP3 to WAV
-    audio = AudioSegment.from_mp3(mp3_path)
-    wav_path = mp3_path.replace(".mp3", ".wav")
-    audio.export(wav_path, format="wav")
-
-    # Load audio file
-    with sr.AudioFile(wav_path) as source:
-      # Adjust for ambient noise
-      recognizer.adjust_for_ambient_noise(source)
-      # Record the audio
-      audio_data = recognizer.record(source)
-
-    # Clean up temporary WAV file
-    os.remove(wav_path)
-
-    # Perform speech recognition
-    text = recognizer.recognize_google(audio_data)
+    # Decode the MP3 in memory; no temporary file, so concurrent calls cannot collide
+    audio = preprocess(decode_audio(mp3_path))
+    if len(audio) > TRANSCRIBE_CHUNK_MS:
+      text = transcribe_chunked(audio, backend=backend)
+    else:
+      # Hand the PCM straight to the recognizer
+      audio_data = sr.AudioData(audio.raw_data, audio.frame_rate, audio.sample_width)
+      text = recognize(audio_data, backend)
+
+    # Partial transcripts are not cached so the failed chunks are retried next time
+    if FAILED_CHUNK not in text:
+      transcript_cache.set(key, text)
     return text
 
   except sr.UnknownValueError:
     raise ValueError("Could not understand the audio.")
   except sr.RequestError as e:
     raise ValueError(f"Could not process audio; {e}")
+  except ValueError:
+    raise
   except Exception as e:
-    raise Exception(f"An error occurred during transcription: {e}")
\ No newline at end of file
+    raise Exception(f"An error occurred during transcription: {e}")
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_text(*parts: Any) -> str:
+    """Return the hex SHA-256 digest of the given parts joined with a separator."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key/value store backed by a single SQLite file.
+
+    Values are stored as JSON. When ``max_bytes`` is set, the least recently
+    used entries are evicted after each write until the stored values fit.
+    Safe to share between threads.
+
+    Example:
+        >>> cache = DiskCache("cache/answers.sqlite")
+        >>> cache.set("task-1", "42")
+        >>> cache.get("task-1")
+        '42'
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            if self.max_bytes is not None:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+
+class TTLCache:
+    """
+    In-memory LRU cache whose entries expire ``ttl`` seconds after being stored.
+
+    When a ``disk`` cache is given, it is used as a second level: writes go
+    to both, and memory misses fall back to unexpired disk entries. Counts
+    hits and misses. Safe to share between threads.
+
+    Example:
+        >>> cache = TTLCache(ttl=3600, maxsize=512)
+        >>> cache.set("beatles albums", "...")
+        >>> cache.get("beatles albums")
+        '...'
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024, disk: Optional[DiskCache] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None and now - stored["created"] < self.ttl:
+                with self._lock:
+                    self._put(key, stored["created"], stored["value"])
+                    self.hits += 1
+                return stored["value"]
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._put(key, now, value)
+        if self.disk is not None:
+            self.disk.set(key, {"created": now, "value": value})
+
+    def _put(self, key: str, created: float, value: Any) -> None:
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_MAX_TRIES = int(os.getenv("HTTP_MAX_TRIES", "3"))
+# Per-host connection caps, e.g. "agents-course-unit4-scoring.hf.space=8,example.com=2"
+HTTP_HOST_LIMITS = os.getenv("HTTP_HOST_LIMITS", "")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def parse_host_limits(spec: str) -> dict:
+    limits = {}
+    for part in spec.split(","):
+        host, _, value = part.partition("=")
+        if host.strip() and value.strip():
+            limits[host.strip()] = int(value)
+    return limits
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, stretched to honour a numeric ``Retry-After``."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(cap, float(retry_after)))
+    return delay
+
+
+class RequestStats:
+    """Thread-safe per-endpoint request counters and timings."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, url: str, elapsed: float, failed: bool, retries: int) -> None:
+        key = f"{method} {urlsplit(url).hostname}"
+        with self._lock:
+            entry = self._metrics.setdefault(
+                key, {"count": 0, "errors": 0, "retries": 0, "total_s": 0.0, "max_s": 0.0}
+            )
+            entry["count"] += 1
+            entry["errors"] += int(failed)
+            entry["retries"] += retries
+            entry["total_s"] += elapsed
+            entry["max_s"] = max(entry["max_s"], elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: dict(entry, mean_s=entry["total_s"] / entry["count"] if entry["count"] else 0.0)
+                for key, entry in self._metrics.items()
+            }
+
+
+class AsyncHttpClient:
+    """
+    Shared asyncio HTTP client with keep-alive connection pooling, retries and timing metrics.
+
+    Requests go through one ``httpx.AsyncClient``, so repeated calls to the
+    same host reuse open TCP/TLS connections. ``host_limits`` caps concurrent
+    requests per host with a semaphore. Transport errors and 429/5xx
+    responses are retried with full-jitter exponential backoff (honouring
+    ``Retry-After``). Only idempotent methods are retried unless ``max_tries``
+    is passed explicitly. Timings are recorded per method and host.
+    ``download`` streams a body to disk through a temporary file that is
+    renamed into place.
+
+    Example:
+        >>> client = get_async_http_client()
+        >>> questions = (await client.get("https://example.com/questions", timeout=15)).json()
+        >>> client.stats()["GET example.com"]["count"]
+        1
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        max_tries: int = HTTP_MAX_TRIES,
+        host_limits: Optional[dict] = None,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 10.0,
+    ):
+        self.max_tries = max_tries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            follow_redirects=True,
+        )
+        self._host_slots = {host: asyncio.Semaphore(limit) for host, limit in (host_limits or {}).items()}
+        self._stats = RequestStats()
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def _slot(self, url: str):
+        slot = self._host_slots.get(urlsplit(url).hostname)
+        return slot if slot is not None else _NO_LIMIT
+
+    async def _send(self, method: str, url: str, max_tries: int, send) -> object:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            response = None
+            try:
+                async with self._slot(url):
+                    response = await send()
+                if response.status_code not in RETRY_STATUSES or attempt + 1 >= max_tries:
+                    self._stats.record(method, url, time.perf_counter() - start, response.status_code >= 400, attempt)
+                    return response
+            except httpx.TransportError:
+                if attempt + 1 >= max_tries:
+                    self._stats.record(method, url, time.perf_counter() - start, True, attempt)
+                    raise
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap, retry_after))
+            attempt += 1
+
+    async def request(self, method: str, url: str, max_tries: Optional[int] = None, **kwargs) -> httpx.Response:
+        method = method.upper()
+        if max_tries is None:
+            max_tries = self.max_tries if method in IDEMPOTENT_METHODS else 1
+        return await self._send(method, url, max_tries, lambda: self.client.request(method, url, **kwargs))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def download(self, url: str, file_path: str, timeout: float = 30,
+                       chunk_size: int = 64 * 1024, max_tries: Optional[int] = None) -> int:
+        """
+        Stream ``url`` to ``file_path`` and return the bytes written. The file
+        only appears once it is complete and matches Content-Length; the whole
+        transfer is retried on transport errors and 429/5xx responses.
+        """
+        directory = os.path.dirname(file_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+
+        async def _attempt() -> httpx.Response:
+            nonlocal written
+            async with self.client.stream("GET", url, timeout=timeout) as response:
+                if response.status_code >= 400:
+                    return response
+                # Content-Length counts encoded bytes; only compare it when the body is not decoded
+                expected = None
+                if response.headers.get("Content-Encoding", "identity") == "identity":
+                    expected = response.headers.get("Content-Length")
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".partial-")
+                try:
+                    written = 0
+                    with os.fdopen(fd, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            f.write(chunk)
+                            written += len(chunk)
+                    if expected is not None and int(expected) != written:
+                        raise httpx.TransportError(f"Incomplete download: got {written} of {expected} bytes from {url}")
+                    os.replace(tmp_path, file_path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                return response
+
+        response = await self._send("GET", url, max_tries or self.max_tries, _attempt)
+        response.raise_for_status()
+        return written
+
+    def stats(self) -> dict:
+        return self._stats.snapshot()
+
+    def reset_stats(self) -> None:
+        self._stats = RequestStats()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+_NO_LIMIT = _NoLimit()
+
+
+_client: Optional[AsyncHttpClient] = None
+_client_loop = None
+_client_lock = threading.Lock()
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """
+    Return the process-wide async HTTP client, creating it on first use.
+    httpx connections belong to the event loop that opened them, so the
+    client is rebuilt when called from a different running loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _client is None or _client_loop is not loop:
+            _client = AsyncHttpClient(host_limits=parse_host_limits(HTTP_HOST_LIMITS))
+            _client_loop = loop
+        return _client
@@ -0,0 +1,99 @@
+import json
+import os
+from typing import Optional
+
+from smolagents.models import ChatMessage, get_dict_from_nested_dataclasses
+from smolagents.monitoring import TokenUsage
+
+from tools.cache import DiskCache, sha256_text
+from tools.metrics import instrument_model, metrics
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "passthrough")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm.sqlite"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 2**20)))
+
+MODES = ("record", "replay", "passthrough")
+
+
+def _message_dict(message) -> dict:
+    return message if isinstance(message, dict) else get_dict_from_nested_dataclasses(message, ignore_key="raw")
+
+
+class CachingModel:
+    """
+    Proxy around a smolagents model that stores responses on disk.
+
+    Responses are keyed by a hash of the full message list, the model id, the
+    model's own generation parameters and the per-call arguments (stop
+    sequences, response format, tool names and extra kwargs). Modes:
+
+    * ``record``: serve cached responses, call the model on a miss and store it;
+    * ``replay``: serve cached responses only, raise ``LookupError`` on a miss;
+    * ``passthrough``: always call the model, never read or write the cache.
+
+    The store is a ``DiskCache`` with least-recently-used eviction past
+    ``max_bytes``. Streaming is hidden outside passthrough so every call goes
+    through ``generate``. The wrapped model is instrumented inside the cache,
+    so only real model calls count towards the model timings and token
+    counters; hits show up in ``llm_cache_hits_total``.
+
+    Example:
+        >>> model = CachingModel(OpenAIServerModel(model_id="gpt-4.1"), mode="record")
+        >>> agent = BasicAgent(model)
+    """
+
+    def __init__(self, model, mode: str = LLM_CACHE_MODE, path: str = LLM_CACHE_PATH,
+                 max_bytes: Optional[int] = LLM_CACHE_MAX_BYTES, cache: Optional[DiskCache] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}; expected one of {', '.join(MODES)}")
+        self._model = instrument_model(model)
+        self.mode = mode
+        self.cache = cache if cache is not None else DiskCache(path, max_bytes=max_bytes)
+
+    @property
+    def wrapped(self):
+        return self._model
+
+    def cache_key(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs) -> str:
+        request = {
+            "model_id": getattr(self._model, "model_id", type(self._model).__name__),
+            "model_params": getattr(self._model, "kwargs", {}),
+            "messages": [_message_dict(m) for m in messages],
+            "stop_sequences": stop_sequences,
+            "response_format": response_format,
+            "tools": sorted(t.name for t in tools_to_call_from or []),
+            "kwargs": kwargs,
+        }
+        return sha256_text(json.dumps(request, sort_keys=True, default=str))
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+        if self.mode == "passthrough":
+            return self._model.generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                        tools_to_call_from=tools_to_call_from, **kwargs)
+        key = self.cache_key(messages, stop_sequences, response_format, tools_to_call_from, **kwargs)
+        stored = self.cache.get(key)
+        if stored is not None:
+            metrics.increment("llm_cache_hits_total")
+            usage = stored.get("token_usage")
+            return ChatMessage.from_dict(
+                stored["message"], token_usage=TokenUsage(**usage) if usage else None
+            )
+        metrics.increment("llm_cache_misses_total")
+        if self.mode == "replay":
+            raise LookupError(f"No recorded response for this prompt (key {key[:12]}) in replay mode")
+        message = self._model.generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                       tools_to_call_from=tools_to_call_from, **kwargs)
+        usage = message.token_usage
+        self.cache.set(key, {
+            "message": _message_dict(message),
+            "token_usage": {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens} if usage else None,
+        })
+        return message
+
+    def __call__(self, messages, *args, **kwargs):
+        return self.generate(messages, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name == "generate_stream" and self.mode != "passthrough":
+            raise AttributeError(name)
+        return getattr(self._model, name)
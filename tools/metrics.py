@@ -0,0 +1,248 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from typing import Any
+
+from tools import tracing
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+
+
+def payload_size(value: Any) -> int:
+    """Approximate size in bytes of a tool or model payload."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(payload_size(v) for v in value.values())
+    content = getattr(value, "content", None)
+    if content is not None:
+        return payload_size(content)
+    return len(str(value).encode("utf-8"))
+
+
+class _Series:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, error: bool, bytes_in: int, bytes_out: int) -> None:
+        self.calls += 1
+        self.errors += int(error)
+        self.seconds += seconds
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "seconds_total": self.seconds,
+            "seconds_mean": self.seconds / self.calls if self.calls else 0.0,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency_buckets": {str(b): n for b, n in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe call counts, latency histograms, error counts and payload sizes
+    for the tools and the model client, plus free-form counters such as token
+    usage. Export as JSON with ``snapshot``/``dump`` or as Prometheus text
+    exposition format with ``to_prometheus``.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False,
+                bytes_in: int = 0, bytes_out: int = 0) -> None:
+        with self._lock:
+            self._series.setdefault((kind, name), _Series()).observe(seconds, error, bytes_in, bytes_out)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = {}
+            for (kind, name), series in sorted(self._series.items()):
+                calls.setdefault(kind, {})[name] = series.to_dict()
+            return {"calls": calls, "counters": dict(self._counters)}
+
+    def dump(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def to_prometheus(self, prefix: str = "agent") -> str:
+        lines = []
+        with self._lock:
+            series = sorted(self._series.items())
+            counters = sorted(self._counters.items())
+        for metric, attr, help_text in (
+            ("calls_total", "calls", "Number of calls."),
+            ("errors_total", "errors", "Number of calls that raised."),
+            ("bytes_in_total", "bytes_in", "Approximate input payload bytes."),
+            ("bytes_out_total", "bytes_out", "Approximate output payload bytes."),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for (kind, name), s in series:
+                lines.append(f'{prefix}_{metric}{{kind="{kind}",name="{name}"}} {getattr(s, attr)}')
+        lines.append(f"# HELP {prefix}_latency_seconds Call latency.")
+        lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+        for (kind, name), s in series:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, s.buckets):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f'{prefix}_latency_seconds_bucket{{kind="{kind}",name="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_latency_seconds_sum{{kind="{kind}",name="{name}"}} {s.seconds:.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{kind="{kind}",name="{name}"}} {s.calls}')
+        for name, value in counters:
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every agent in the process
+metrics = MetricsRegistry()
+
+
+def instrument_tool(tool, registry: MetricsRegistry = metrics):
+    """
+    Wrap ``tool.forward`` so every call is timed and counted, and traced when
+    a trace is active. Safe to call twice.
+    """
+    if getattr(tool, "_instrumented", False):
+        return tool
+    forward = tool.forward
+
+    @functools.wraps(forward)
+    def timed_forward(*args, **kwargs):
+        start = time.perf_counter()
+        error = False
+        result = None
+        try:
+            with tracing.span(tool.name, "tool"):
+                result = forward(*args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            registry.observe(
+                "tool", tool.name, time.perf_counter() - start, error,
+                payload_size(list(args) + list(kwargs.values())), payload_size(result),
+            )
+
+    tool.forward = timed_forward
+    tool._instrumented = True
+    return tool
+
+
+class InstrumentedModel:
+    """
+    Proxy around a smolagents model that times ``generate``, ``__call__`` and
+    ``generate_stream``, counts input/output tokens and emits an ``llm`` span
+    per call when tracing. Every other attribute is read from the wrapped model.
+    """
+
+    def __init__(self, model, registry: MetricsRegistry = metrics):
+        self._model = model
+        self._registry = registry
+
+    @property
+    def wrapped(self):
+        return self._model
+
+    def _record(self, start: float, error: bool, messages, message) -> None:
+        elapsed = time.perf_counter() - start
+        model_id = getattr(self._model, "model_id", type(self._model).__name__)
+        self._registry.observe("model", model_id, elapsed, error, payload_size(messages), payload_size(message))
+        usage = getattr(message, "token_usage", None)
+        if usage is not None:
+            self._registry.increment("model_input_tokens_total", usage.input_tokens)
+            self._registry.increment("model_output_tokens_total", usage.output_tokens)
+        tracing.record_span(
+            "llm", "llm", time.time() - elapsed, model_id=model_id, error=error,
+            input_tokens=getattr(usage, "input_tokens", None),
+            output_tokens=getattr(usage, "output_tokens", None),
+        )
+
+    def generate(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            message = self._model.generate(messages, *args, **kwargs)
+        except Exception:
+            self._record(start, True, messages, None)
+            raise
+        self._record(start, False, messages, message)
+        return message
+
+    def __call__(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            message = self._model(messages, *args, **kwargs)
+        except Exception:
+            self._record(start, True, messages, None)
+            raise
+        self._record(start, False, messages, message)
+        return message
+
+    def _generate_stream(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        content = []
+        try:
+            for event in self._model.generate_stream(messages, *args, **kwargs):
+                content.append(getattr(event, "content", None) or "")
+                yield event
+        except Exception:
+            self._record(start, True, messages, None)
+            raise
+        self._record(start, False, messages, "".join(content))
+
+    def __getattr__(self, name: str):
+        if name == "generate_stream" and hasattr(self._model, "generate_stream"):
+            return self._generate_stream
+        return getattr(self._model, name)
+
+
+def instrument_model(model, registry: MetricsRegistry = metrics):
+    """Wrap ``model`` in ``InstrumentedModel`` unless it, or a model it proxies, already is one."""
+    inner = model
+    while inner is not None:
+        if isinstance(inner, InstrumentedModel):
+            return model
+        inner = getattr(inner, "wrapped", None)
+    return InstrumentedModel(model, registry)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter with adaptive backoff.
+
+    Up to ``burst`` calls go through immediately; after that callers wait just
+    long enough to keep the average at ``rate`` calls per second. When the
+    provider reports a rate limit, ``backoff()`` halves the rate and pauses
+    all callers for an exponentially growing delay; every ``success()`` then
+    recovers the rate additively towards its configured value.
+
+    Example:
+        >>> limiter = TokenBucket(rate=0.5, burst=3)
+        >>> limiter.acquire()  # returns the seconds spent waiting
+        0.0
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        min_rate: float | None = None,
+        initial_backoff: float = 2.0,
+        max_backoff: float = 60.0,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate / 8
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._penalty = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a call is allowed and return how long we waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def backoff(self) -> float:
+        """Record a rate-limit response; returns the pause imposed on all callers."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._penalty = min(self.max_backoff, self._penalty * 2 if self._penalty else self.initial_backoff)
+            self._tokens = 0.0
+            self._blocked_until = time.monotonic() + self._penalty
+            return self._penalty
+
+    def success(self) -> None:
+        """Record a successful call, slowly restoring the configured rate."""
+        with self._lock:
+            self._penalty = 0.0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import speech_recognition as sr
+
+from tools import tracing
+
+TRANSCRIBE_BACKEND = os.getenv("TRANSCRIBE_BACKEND", "google")
+TRANSCRIBE_LANGUAGE = os.getenv("TRANSCRIBE_LANGUAGE", "en-US")
+# Worker processes for CPU-bound backends; each one loads its own model
+TRANSCRIBE_PROCESSES = int(os.getenv("TRANSCRIBE_PROCESSES", str(min(4, os.cpu_count() or 1))))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base.en")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+
+class SpeechBackend:
+    """
+    A speech-recognition engine used by ``transcribe_audio``.
+
+    ``recognize`` takes an ``sr.AudioData`` and returns the text. It raises
+    ``sr.UnknownValueError`` when there is no intelligible speech and
+    ``sr.RequestError`` for failures worth retrying. ``options`` holds the
+    constructor arguments, so a backend can be rebuilt in a worker process,
+    and ``settings`` identifies everything that changes the output.
+    Backends with ``cpu_bound`` set run in a process pool.
+    """
+
+    name = ""
+    cpu_bound = False
+
+    def __init__(self, **options):
+        self.options = options
+
+    def settings(self) -> dict:
+        return {"backend": self.name, **self.options}
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+
+class GoogleBackend(SpeechBackend):
+    """Google's free web speech endpoint: one network round trip per call."""
+
+    name = "google"
+
+    def __init__(self, language: str = TRANSCRIBE_LANGUAGE):
+        super().__init__(language=language)
+        self.language = language
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        return sr.Recognizer().recognize_google(audio, language=self.language)
+
+
+class WhisperBackend(SpeechBackend):
+    """
+    Local CPU transcription with faster-whisper (``pip install faster-whisper``).
+    The model is loaded on first use and kept for the life of the process.
+    """
+
+    name = "whisper"
+    cpu_bound = True
+
+    def __init__(self, model: str = WHISPER_MODEL, compute_type: str = WHISPER_COMPUTE_TYPE,
+                 language: str = TRANSCRIBE_LANGUAGE.split("-")[0], beam_size: int = 5):
+        super().__init__(model=model, compute_type=compute_type, language=language, beam_size=beam_size)
+        self._model = None
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError as e:
+                raise RuntimeError("The whisper backend needs faster-whisper: pip install faster-whisper") from e
+            self._model = WhisperModel(self.options["model"], device="cpu", compute_type=self.options["compute_type"])
+        return self._model
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        import numpy as np
+
+        pcm = audio.get_raw_data(convert_rate=16000, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self._load().transcribe(
+            samples, language=self.options["language"], beam_size=self.options["beam_size"]
+        )
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class SphinxBackend(SpeechBackend):
+    """Local CPU transcription with CMU Sphinx (``pip install pocketsphinx``); fast but less accurate."""
+
+    name = "sphinx"
+    cpu_bound = True
+
+    def __init__(self, language: str = TRANSCRIBE_LANGUAGE):
+        super().__init__(language=language)
+        self.language = language
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        try:
+            import pocketsphinx  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("The sphinx backend needs pocketsphinx: pip install pocketsphinx") from e
+        return sr.Recognizer().recognize_sphinx(audio, language=self.language)
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, WhisperBackend, SphinxBackend)}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None, **options) -> SpeechBackend:
+    """Return the shared backend ``name`` (default: TRANSCRIBE_BACKEND), creating it on first use."""
+    name = name or TRANSCRIBE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    key = (name, tuple(sorted(options.items())))
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = BACKENDS[name](**options)
+        return _backends[key]
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+# Backends rebuilt inside a worker process, so each process loads its model once
+_worker_backends = {}
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # The parent runs many threads, which plain fork does not copy safely
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, TRANSCRIBE_PROCESSES), mp_context=context)
+        return _process_pool
+
+
+def _recognize_in_worker(name: str, options: dict, audio: sr.AudioData) -> str:
+    key = (name, tuple(sorted(options.items())))
+    if key not in _worker_backends:
+        _worker_backends[key] = BACKENDS[name](**options)
+    return _worker_backends[key].recognize(audio)
+
+
+def recognize(audio: sr.AudioData, backend: Optional[SpeechBackend] = None, **span_attrs) -> str:
+    """Transcribe ``audio`` with ``backend``, in the process pool when it is CPU-bound."""
+    backend = backend or get_backend()
+    seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    with tracing.span("speech.recognize", "audio", backend=backend.name, seconds=seconds, **span_attrs):
+        if backend.cpu_bound:
+            future = _get_process_pool().submit(_recognize_in_worker, backend.name, backend.options, audio)
+            return future.result()
+        return backend.recognize(audio)
@@ -0,0 +1,176 @@
+import math
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Iterable, Iterator
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def chunk_spans(text: str, chunk_size: int, overlap: int = 0) -> list:
+    """
+    Split ``text`` into ``(start, end)`` spans of at most ``chunk_size`` characters.
+
+    Chunks are built from whole sentences where possible, and each chunk
+    starts with the trailing sentences of the previous one that fit in
+    ``overlap`` characters, so a keyword near a boundary is never cut in
+    half. Sentences longer than ``chunk_size`` fall back to overlapping
+    fixed windows.
+
+    Example:
+        >>> chunk_spans("One. Two. Three.", 10)
+        [(0, 10), (10, 16)]
+    """
+    chunk_size = max(1, int(chunk_size))
+    overlap = max(0, min(int(overlap), chunk_size // 2))
+    sentences = []
+    start = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        if match.end() > start:
+            sentences.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        sentences.append((start, len(text)))
+
+    spans = []
+    current = []  # sentences in the chunk being built
+    for s, e in sentences:
+        if e - s > chunk_size:
+            if current:
+                spans.append((current[0][0], current[-1][1]))
+                current = []
+            for i in range(s, e, chunk_size - overlap):
+                spans.append((i, min(i + chunk_size, e)))
+                if i + chunk_size >= e:
+                    break
+            continue
+        if current and e - current[0][0] > chunk_size:
+            end = current[-1][1]
+            spans.append((current[0][0], end))
+            current = [c for c in current if end - c[0] <= overlap and e - c[0] <= chunk_size]
+        current.append((s, e))
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+    return spans
+
+
+def bm25_scores(chunk_hits: list, chunk_lengths: list, k1: float = 1.2, b: float = 0.75) -> list:
+    """Score each chunk with BM25, treating every chunk as a document and each keyword as a query term."""
+    if not chunk_hits:
+        return []
+    n = len(chunk_hits)
+    avg_length = (sum(chunk_lengths) / n) or 1
+    document_frequency = Counter(keyword for hits in chunk_hits for keyword in hits)
+    idf = {
+        keyword: math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for keyword, df in document_frequency.items()
+    }
+    scores = []
+    for hits, length in zip(chunk_hits, chunk_lengths):
+        norm = k1 * (1 - b + b * length / avg_length)
+        scores.append(sum(idf[k] * tf * (k1 + 1) / (tf + norm) for k, tf in hits.items()))
+    return scores
+
+
+def _uncovered(start: int, end: int, covered: list) -> list:
+    """Parts of ``[start, end)`` outside every ``(start, end)`` span in ``covered``."""
+    pieces = [(start, end)]
+    for c_start, c_end in covered:
+        pieces = [
+            part
+            for p_start, p_end in pieces
+            for part in ((p_start, min(p_end, c_start)), (max(p_start, c_end), p_end))
+            if part[1] > part[0]
+        ]
+    return pieces
+
+
+def select_chunks(text: str, spans: list, scores: list, max_chars: int, top_k: int | None = None) -> list:
+    """
+    Return the best-scoring chunks, highest first, until ``max_chars`` or ``top_k`` is reached.
+
+    Spans may overlap: a chunk is trimmed to the text no earlier selection
+    covers, and skipped if nothing is left, so no sentence is returned twice
+    and only new characters count towards ``max_chars``.
+    """
+    ranked = sorted(
+        (i for i, score in enumerate(scores) if score > 0),
+        key=lambda i: (-scores[i], i),
+    )
+    selected = []
+    covered = []
+    used = 0
+    for i in ranked:
+        pieces = _uncovered(*spans[i], covered)
+        size = sum(end - start for start, end in pieces)
+        if not pieces or (selected and used + size > max_chars):
+            continue
+        chunk = " ".join(text[start:end].strip() for start, end in pieces).strip()
+        covered.extend(pieces)
+        used += size
+        if not chunk:
+            continue
+        selected.append(chunk)
+        if top_k is not None and len(selected) >= top_k:
+            break
+    return selected
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-keyword matcher that scans the text in a single pass.
+
+    All keywords are compiled into one alternation regex (longest first)
+    inside a lookahead, so every start position is tested once. Keywords
+    that overlap are all reported: 'Abbey Road' and 'Road' at different
+    starts, and 'Let It Be' and 'Let' at the same one. Matching runs on the
+    original text, so positions are valid for it even where lower-casing
+    changes the length (e.g. 'İ').
+
+    Example:
+        >>> matcher = KeywordMatcher(["Abbey Road", "1970"])
+        >>> matcher.span_hits("Abbey Road came out in 1969.", [(0, 10), (10, 20), (20, 28)])
+        [Counter({'Abbey Road': 1}), Counter(), Counter()]
+    """
+
+    def __init__(self, keywords: Iterable):
+        self._originals = {}
+        for word in keywords:
+            word = str(word).strip()
+            if word:
+                self._originals.setdefault(word.lower(), word)
+        self._ordered = sorted(self._originals.values(), key=len, reverse=True)
+        # Shorter keywords that also match wherever a longer one does, e.g. 'Let' inside 'Let It Be'
+        self._prefixes = [
+            [short for short in self._ordered[i + 1:]
+             if len(short) < len(word) and re.fullmatch(re.escape(short), word[:len(short)], re.IGNORECASE)]
+            for i, word in enumerate(self._ordered)
+        ]
+        self._pattern = (
+            re.compile("(?=(?:" + "|".join(f"({re.escape(w)})" for w in self._ordered) + "))", re.IGNORECASE)
+            if self._ordered else None
+        )
+
+    def finditer(self, text: str) -> Iterator[tuple]:
+        """Yield ``(start, keyword)`` for each match in ``text``; a keyword spans ``len(keyword)`` characters."""
+        if self._pattern is None:
+            return
+        for match in self._pattern.finditer(text):
+            index = match.lastindex - 1
+            yield match.start(), self._ordered[index]
+            for keyword in self._prefixes[index]:
+                yield match.start(), keyword
+
+    def span_hits(self, text: str, spans: list) -> list:
+        """Count keyword occurrences fully inside each ``(start, end)`` span; spans may overlap."""
+        matches = list(self.finditer(text))
+        starts = [start for start, _ in matches]
+        counts = []
+        for span_start, span_end in spans:
+            counter = Counter()
+            for i in range(bisect_left(starts, span_start), bisect_right(starts, span_end - 1)):
+                start, keyword = matches[i]
+                if start + len(keyword) <= span_end:
+                    counter[keyword] += 1
+            counts.append(counter)
+        return counts
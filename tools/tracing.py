@@ -0,0 +1,188 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation inside a ``Trace``; ``start``/``end`` are epoch seconds."""
+
+    def __init__(self, trace: "Trace", name: str, category: str, parent: Optional["Span"], attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.attrs = attrs
+        self.span_id = next(_span_ids)
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.end = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+
+class Trace:
+    """
+    Span tree recorded for one agent run.
+
+    Spans nest through a context variable, so ``span()`` calls made anywhere
+    below ``start_trace()`` on the same thread land in the right place; use
+    ``carry()`` to hand the current span to a function that runs on another
+    thread. ``to_chrome()`` exports the tree in the Chrome trace event format
+    (complete "X" events), which chrome://tracing, Perfetto and most
+    OpenTelemetry trace viewers load directly.
+
+    Example:
+        >>> with start_trace("question", task_id="t1") as trace:
+        ...     with span("download", "io", url="https://example.com/f.mp3"):
+        ...         fetch()
+        >>> trace.dump("traces/t1.trace.json")
+    """
+
+    def __init__(self, name: str, **attrs):
+        self._lock = threading.Lock()
+        self.spans = []
+        self.root = self._add(name, "run", None, attrs)
+
+    def _add(self, name: str, category: str, parent: Optional[Span], attrs: dict) -> Span:
+        s = Span(self, name, category, parent, attrs)
+        with self._lock:
+            self.spans.append(s)
+        return s
+
+    def add_span(self, name: str, category: str, start: float, end: float, **attrs) -> Span:
+        """
+        Record an already finished operation (e.g. an agent step timed by the
+        framework) and adopt the top-level spans that ran inside its window.
+        An operation that began before the trace, such as an attachment
+        prefetched for the question, moves the root's start back to it.
+        """
+        s = self._add(name, category, self.root, attrs)
+        s.start, s.end = start, end
+        with self._lock:
+            self.root.start = min(self.root.start, start)
+            for other in self.spans:
+                if other.parent is self.root and other is not s and start <= other.start <= end:
+                    other.parent = s
+        return s
+
+    def to_chrome(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        origin = self.root.start
+        events = []
+        for s in spans:
+            args = dict(s.attrs, span_id=s.span_id, thread=s.thread)
+            if s.parent is not None:
+                args["parent_id"] = s.parent.span_id
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round((s.start - origin) * 1e6),
+                "dur": round(s.duration * 1e6),
+                "pid": 1,
+                # One row per run: nested spans are drawn by time, even across threads
+                "tid": 1,
+                "args": _jsonable(args),
+            })
+        events.sort(key=lambda e: (e["ts"], -e["dur"]))
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace": self.root.name, "start_time": origin},
+        }
+
+    def dump(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+        return path
+
+
+def _jsonable(attrs: dict) -> dict:
+    return {k: v if isinstance(v, (str, int, float, bool, type(None))) else str(v) for k, v in attrs.items()}
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def attach(parent: Optional[Span]):
+    """Make ``parent`` the current span, e.g. on a worker thread."""
+    token = _current_span.set(parent)
+    try:
+        yield parent
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """Record a new trace; the root span ends when the block exits."""
+    trace = Trace(name, **attrs)
+    try:
+        with attach(trace.root):
+            yield trace
+    finally:
+        trace.root.end = time.time()
+
+
+@contextmanager
+def span(name: str, category: str = "", **attrs):
+    """
+    Time the block as a child of the current span. Outside a trace this is a
+    no-op that yields None, so instrumented code pays almost nothing.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    s = parent.trace._add(name, category, parent, attrs)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        s.end = time.time()
+        _current_span.reset(token)
+
+
+def record_span(name: str, category: str, start: float, **attrs) -> Optional[Span]:
+    """Add a span that started at ``start`` (epoch seconds) and ends now under the current span."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    s = parent.trace._add(name, category, parent, attrs)
+    s.start, s.end = start, time.time()
+    return s
+
+
+def carry(fn):
+    """Bind ``fn`` to the current span so spans it opens on another thread join this trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return fn
+
+    def call(*args, **kwargs):
+        with attach(parent):
+            return fn(*args, **kwargs)
+
+    return call
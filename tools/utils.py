@@ -1,6 +1,5 @@
 import os
 from typing import Union
-import requests
 import pandas as pd
 import subprocess
 import sys
@@ -26,38 +25,6 @@ def reverse_string(text: str) -> str:
   return text[::-1]
 
 
-def download_file(url: str, filename: str) -> str:
-  """
-  Download a file from the given URL and save it to a temporary location.
-  Args:
-      url (str): The URL of the file to download.
-      filename (str): The name to use for the saved file.
-      
-  Returns:
-      str: Full path to the downloaded file in temporary directory.
-      
-  Raises:
-      requests.RequestException: If the download fails.
-      
-  Example:
-      >>> path = download_file("https://example.com/data.json", "my_data.json")
-      >>> print(path)
-      '/tmp/tmpxyz123/my_data.json'
-  """
-    
-  file_path = os.path.join("downloaded_files", filename)
-  if not os.path.exists(file_path):
-      print(f"Attempting to download file from: {url}")
-      try:
-          response = requests.get(url, timeout=30)
-          response.raise_for_status()
-          os.makedirs("downloaded_files", exist_ok=True)
-          with open(file_path, "wb") as f:
-              f.write(response.content)
-      except requests.exceptions.RequestException as e:
-          print(f"Error downloading file: {e}")
-  return file_path
-
 @tool
 def process_excel_file(file_path: str) -> pd.DataFrame:
   """
@@ -1,44 +1,184 @@
-import time
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from smolagents import DuckDuckGoSearchTool
 from smolagents import tool
+from tools.cache import DiskCache, TTLCache
+from tools.ratelimit import TokenBucket
+from tools.text import KeywordMatcher, bm25_scores, chunk_spans, select_chunks
+
+try:
+    from ddgs.exceptions import DDGSException, RatelimitException
+except ImportError:
+    DDGSException = None
+    try:
+        from duckduckgo_search.exceptions import RatelimitException
+    except ImportError:
+        RatelimitException = None
+
+SEARCH_RATE = float(os.getenv("SEARCH_RATE_PER_SEC", "0.5"))
+SEARCH_BURST = int(os.getenv("SEARCH_BURST", "3"))
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")  # optional on-disk second level
+SEARCH_POOL_SIZE = int(os.getenv("SEARCH_POOL_SIZE", "4"))
+
+
+def unthrottled_search_tool() -> DuckDuckGoSearchTool:
+    """A search client without its own per-instance limiter; ``search_limiter`` throttles all of them together."""
+    return DuckDuckGoSearchTool(rate_limit=None)
+
+
+class SearchClientPool:
+    """
+    Lazily built, thread-safe pool of search clients.
+
+    Each ``DuckDuckGoSearchTool`` keeps its own HTTP client, so reusing them
+    keeps sessions alive across agent steps. At most ``max_size`` clients
+    exist and each is used by one thread at a time.
+    """
+
+    def __init__(self, factory=unthrottled_search_tool, max_size: int = 4):
+        self.factory = factory
+        self.max_size = max_size
+        self.created = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self):
+        with self._slots:
+            try:
+                search_client = self._idle.get_nowait()
+            except queue.Empty:
+                search_client = self.factory()
+                with self._lock:
+                    self.created += 1
+            try:
+                yield search_client
+            finally:
+                self._idle.put(search_client)
+
+
+# Shared by every agent and worker thread in the process
+search_clients = SearchClientPool(max_size=SEARCH_POOL_SIZE)
+search_limiter = TokenBucket(rate=SEARCH_RATE, burst=SEARCH_BURST)
+search_cache = TTLCache(
+    ttl=SEARCH_CACHE_TTL,
+    maxsize=SEARCH_CACHE_SIZE,
+    disk=DiskCache(SEARCH_CACHE_PATH) if SEARCH_CACHE_PATH else None,
+)
+
+
+def normalize_query(search_query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    query = re.sub(r"\s+", " ", search_query).strip().lower()
+    return query.strip(" \"'?!.,;:")
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    if RatelimitException is not None and isinstance(error, RatelimitException):
+        return True
+    message = str(error).lower()
+    return "ratelimit" in message or "rate limit" in message or "429" in message
+
+
+def _is_possible_throttle(error: Exception) -> bool:
+    """
+    ddgs 9 never raises RatelimitException: a throttled engine answers with a
+    non-200 status, which ddgs turns into an empty result and finally
+    ``DDGSException("No results found.")``. That is indistinguishable from a
+    query with no hits, so it is retried once after a backoff, not repeatedly.
+    """
+    return DDGSException is not None and isinstance(error, DDGSException) and "no results found" in str(error).lower()
+
+
+def rate_limited_search(search_tool: DuckDuckGoSearchTool, search_query: str):
+    """Run ``search_tool`` under the shared rate limit, backing off on rate-limit errors."""
+    for attempt in range(SEARCH_MAX_RETRIES + 1):
+        search_limiter.acquire()
+        try:
+            results = search_tool.forward(search_query)
+        except Exception as e:
+            throttled = _is_rate_limit_error(e) or (attempt == 0 and _is_possible_throttle(e))
+            if attempt == SEARCH_MAX_RETRIES or not throttled:
+                raise
+            pause = search_limiter.backoff()
+            print(f"Search rate limited, backing off {pause:.0f}s (rate now {search_limiter.rate:.2f}/s)")
+            continue
+        search_limiter.success()
+        return results
+
+
+def cached_search(search_query: str):
+    """Return cached results for ``search_query`` or fetch and cache them."""
+    key = normalize_query(search_query)
+    results = search_cache.get(key)
+    if results is None:
+        with search_clients.client() as search_client:
+            results = rate_limited_search(search_client, search_query)
+        if results:
+            search_cache.set(key, results)
+    return results
+
+
+def search_content(search_query: str) -> str:
+    """Search for ``search_query`` and return the results as a single string."""
+    search_results = cached_search(search_query)
+    if not search_results:
+        return ""
+    # If search_results is a list of dictionaries, extract the content
+    if isinstance(search_results, list):
+        return " ".join(result.get("content", "") for result in search_results)
+    return search_results
+
+
+def merge_contents(contents: list) -> str:
+    """Join several search result pages, dropping paragraphs already seen in an earlier one."""
+    seen = set()
+    paragraphs = []
+    for content in contents:
+        for paragraph in content.split("\n\n"):
+            key = " ".join(paragraph.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                paragraphs.append(paragraph.strip())
+    return "\n\n".join(paragraphs)
+
+
+def filter_content(content: str, important_words: list, batch_size: int, max_chars: int) -> list:
+    """Return the chunks of ``content`` most relevant to ``important_words``, best first, within ``max_chars``."""
+    spans = chunk_spans(content, batch_size, overlap=batch_size // 5)
+    hits = KeywordMatcher(important_words).span_hits(content, spans)
+    scores = bm25_scores(hits, [end - start for start, end in spans])
+    return select_chunks(content, spans, scores, max_chars)
+
 
 @tool
 def optimized_web_search(
-    search_query: str, important_words: list, batch_size: int = 500
+    search_query: str, important_words: list, batch_size: int = 500, max_chars: int = 3000
 ) -> str:
-    """A tool that performs a web search and filters the results to only include content chunks that contain important keywords.
+    """A tool that performs a web search and returns only the content chunks most relevant to the important keywords, best first.
     Args:
         search_query: The search query to use (e.g., 'Beatles albums Wikipedia')
         important_words: List of important keywords to filter by (e.g., ['Abbey Road', 'Let It Be', '1970'])
         batch_size: The size of content chunks to process (default: 500 characters)
+        max_chars: Maximum total characters of content to return (default: 3000)
     """
     try:
-        # Perform the search using DuckDuckGoSearchTool
-        search_tool = DuckDuckGoSearchTool()
-        time.sleep(10)
-        search_results = search_tool.forward(search_query)
-        # Check if search_results is empty or None
-        if not search_results or len(search_results) == 0:
+        # Perform the search using DuckDuckGoSearchTool, reusing cached results
+        all_content = search_content(search_query)
+        # Check if the search returned nothing
+        if not all_content:
             return "No search results found."
 
-        # If search_results is a dictionary, extract the content
-        if isinstance(search_results, list):
-            all_content = " ".join(
-                [result.get("content", "") for result in search_results]
-            )
-        else:
-            all_content = search_results
-
-
-        batches = []
-        for i in range(0, len(all_content), batch_size):
-            batches.append(all_content[i : i + batch_size])
-
-        # Filter batches 
-        filtered_batches = []
-        for batch in batches:
-            if any(word.lower() in batch.lower() for word in important_words):
-                filtered_batches.append(batch)
+        # Keep the sentence-aligned chunks with the best keyword scores
+        filtered_batches = filter_content(all_content, important_words, batch_size, max_chars)
 
         filtered_content = "\n\n".join(filtered_batches)
 
@@ -48,4 +188,41 @@ def optimized_web_search(
         return filtered_content
 
     except Exception as e:
-        return f"Error during optimized web search: {str(e)}"
\ No newline at end of file
+        return f"Error during optimized web search: {str(e)}"
+
+
+@tool
+def optimized_web_search_batch(
+    search_queries: list, important_words: list, batch_size: int = 500, max_chars: int = 3000
+) -> str:
+    """A tool that runs several related web searches at once and returns one merged, deduplicated set of the content chunks most relevant to the important keywords. Prefer it over several optimized_web_search calls.
+    Args:
+        search_queries: The search queries to run together (e.g., ['Beatles albums Wikipedia', 'Beatles discography 1970'])
+        important_words: List of important keywords to filter by (e.g., ['Abbey Road', 'Let It Be', '1970'])
+        batch_size: The size of content chunks to process (default: 500 characters)
+        max_chars: Maximum total characters of content to return (default: 3000)
+    """
+    queries = list(dict.fromkeys(q for q in search_queries if q and str(q).strip()))
+    if not queries:
+        return "No search queries given."
+
+    def _search(query):
+        try:
+            return search_content(query), None
+        except Exception as e:
+            return "", f"{query!r}: {e}"
+
+    # All queries share the pooled clients, the rate limiter and the result cache
+    with ThreadPoolExecutor(max_workers=min(len(queries), SEARCH_POOL_SIZE)) as pool:
+        outcomes = list(pool.map(_search, queries))
+    errors = [error for _, error in outcomes if error]
+    all_content = merge_contents([content for content, _ in outcomes if content])
+    if not all_content:
+        if errors:
+            return "Error during optimized web search: " + "; ".join(errors)
+        return "No search results found."
+
+    filtered_content = "\n\n".join(filter_content(all_content, important_words, batch_size, max_chars))
+    if not filtered_content:
+        return f"No content containing the important words {important_words} was found in the search results."
+    return filtered_content